@@ -28,13 +28,9 @@ def get_explicit_kpoints(kmesh: orm.KpointsData) -> orm.KpointsData:
     totpts = np.prod(mesh)
     weights = np.ones([totpts]) / totpts
 
-    kpoints = np.zeros([totpts, 3])
-    ind = 0
-    for x in range(mesh[0]):
-        for y in range(mesh[1]):
-            for z in range(mesh[2]):
-                kpoints[ind, :] = [x / mesh[0], y / mesh[1], z / mesh[2]]
-                ind += 1
+    # The last direction runs fastest, i.e. the same order as the nested loops
+    # `for x: for y: for z:` of kmesh.pl
+    kpoints = np.indices(mesh).reshape(3, totpts).T / np.array(mesh)
     klist = orm.KpointsData()
     klist.set_kpoints(kpoints=kpoints, cartesian=False, weights=weights)
     return klist
@@ -1,5 +1,6 @@
 """Utility functions for pseudo potential family."""
 
+import functools
 import typing as ty
 
 from aiida import orm
@@ -49,6 +50,39 @@ def get_pseudo_and_cutoff(
     return pseudos, cutoff_wfc, cutoff_rho
 
 
+# The json files of the semicore metadata of the supported pseudopotential libraries,
+# the first file containing a pseudo (identified by element and md5) takes precedence.
+_SEMICORE_METADATA_FILES = (
+    "semicore/SSSP_1.1_PBEsol_efficiency.json",
+    "semicore/SSSP_1.1_PBE_efficiency.json",
+    "semicore/PseudoDojo_0.4_PBE_SR_standard_upf.json",
+    "semicore/PseudoDojo_0.4_PBE_SR_stringent_upf.json",
+    "semicore/PseudoDojo_0.5_PBE_SR_standard_upf.json",
+    "semicore/PseudoDojo_0.5_PBE_SR_stringent_upf.json",
+    "semicore/PseudoDojo_0.4_LDA_SR_standard_upf.json",
+    "semicore/PseudoDojo_0.4_LDA_SR_stringent_upf.json",
+    "semicore/PseudoDojo_0.4_PBE_FR_standard_upf.json",
+    "semicore/PseudoDojo_0.4_PBEsol_FR_standard_upf.json",
+    "semicore/pslibrary_paw_relpbe_1.0.0.json",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_semicore_metadata() -> ty.Dict[ty.Tuple[str, str], dict]:
+    """Return the semicore metadata of all the supported pseudos, indexed by ``(element, md5)``.
+
+    The json files are only parsed once, the returned dict must not be modified.
+    """
+    from .data import load_pseudo_metadata
+
+    semicore_metadata = {}
+    for filename in _SEMICORE_METADATA_FILES:
+        for element, data in load_pseudo_metadata(filename).items():
+            semicore_metadata.setdefault((element, data["md5"]), data)
+
+    return semicore_metadata
+
+
 def get_pseudo_orbitals(pseudos: ty.Mapping[str, PseudoPotentialData]) -> dict:
     """Get the pseudo wave functions contained in the pseudo potential.
 
@@ -62,47 +96,20 @@ def get_pseudo_orbitals(pseudos: ty.Mapping[str, PseudoPotentialData]) -> dict:
         * PseudoDojo/0.5/PBE/SR/standard/upf
         * PseudoDojo/0.5/PBE/SR/stringent/upf
     """
-    from .data import load_pseudo_metadata
+    from copy import deepcopy
 
-    pseudo_data = []
-    pseudo_data.append(load_pseudo_metadata("semicore/SSSP_1.1_PBEsol_efficiency.json"))
-    pseudo_data.append(load_pseudo_metadata("semicore/SSSP_1.1_PBE_efficiency.json"))
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.4_PBE_SR_standard_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.4_PBE_SR_stringent_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.5_PBE_SR_standard_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.5_PBE_SR_stringent_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.4_LDA_SR_standard_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.4_LDA_SR_stringent_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.4_PBE_FR_standard_upf.json")
-    )
-    pseudo_data.append(
-        load_pseudo_metadata("semicore/PseudoDojo_0.4_PBEsol_FR_standard_upf.json")
-    )
-    pseudo_data.append(load_pseudo_metadata("semicore/pslibrary_paw_relpbe_1.0.0.json"))
+    semicore_metadata = _get_semicore_metadata()
 
     pseudo_orbitals = {}
-    for element in pseudos:
-        for data in pseudo_data:
-            if data.get(element, {}).get("md5", "") == pseudos[element].md5:
-                pseudo_orbitals[element] = data[element]
-                break
-        else:
+    for element, pseudo in pseudos.items():
+        try:
+            data = semicore_metadata[(element, pseudo.md5)]
+        except KeyError as exception:
             raise ValueError(
-                f"Cannot find pseudopotential {element} with md5 {pseudos[element].md5}"
-            )
+                f"Cannot find pseudopotential {element} with md5 {pseudo.md5}"
+            ) from exception
+        # Return a copy so that the callers cannot modify the cached metadata
+        pseudo_orbitals[element] = deepcopy(data)
 
     return pseudo_orbitals
 
@@ -117,8 +124,6 @@ def get_semicore_list(
     :param spin_orbit_coupling: [description]
     :return: [description]
     """
-    from copy import deepcopy
-
     # pw2wannier90.x/projwfc.x store pseudo-wavefunctions in the same order
     # as ATOMIC_POSITIONS in pw.x input file; aiida-quantumespresso writes
     # ATOMIC_POSITIONS in the order of StructureData.sites.
@@ -136,28 +141,41 @@ def get_semicore_list(
     # for spin-orbit-coupling, every orbit contains 2 electrons
     nspin = 2 if spin_orbit_coupling else 1
 
-    semicore_list = []  # index should start from 1
-    num_pswfcs = 0
-
-    for site in structure.sites:
-        # Here I use deepcopy to make sure list.remove() does not interfere with the original list.
-        site_pswfcs = deepcopy(pseudo_orbitals[site.kind_name]["pswfcs"])
-        site_semicores = deepcopy(pseudo_orbitals[site.kind_name]["semicores"])
-
-        for orb in site_pswfcs:
+    # The number of pswfcs and the semicore indices (relative to the first pswfc
+    # of the site) are the same for all the sites of a kind, compute them once.
+    kind_semicores = {}
+    for kind in structure.kinds:
+        orbitals = pseudo_orbitals[kind.name]
+        # The semicores which have not been found in the pswfcs yet
+        remaining_semicores = set(orbitals["semicores"])
+        semicore_offsets = []
+        num_kind_pswfcs = 0
+
+        for orb in orbitals["pswfcs"]:
             num_orbs = label2num[orb[-1]] * nspin
-            if orb in site_semicores:
-                site_semicores.remove(orb)
-                semicore_list.extend(
-                    list(range(num_pswfcs + 1, num_pswfcs + num_orbs + 1))
+            if orb in remaining_semicores:
+                remaining_semicores.discard(orb)
+                semicore_offsets.extend(
+                    range(num_kind_pswfcs + 1, num_kind_pswfcs + num_orbs + 1)
                 )
-            num_pswfcs += num_orbs
+            num_kind_pswfcs += num_orbs
 
-        if len(site_semicores) != 0:
-            return ValueError(
-                f"Error when processing pseudo {site.kind_name} with orbitals {pseudo_orbitals}"
+        if remaining_semicores:
+            raise ValueError(
+                f"Error when processing pseudo {kind.name} with orbitals {orbitals}, "
+                f"semicores {remaining_semicores} are not in the pswfcs"
             )
 
+        kind_semicores[kind.name] = (num_kind_pswfcs, semicore_offsets)
+
+    semicore_list = []  # index should start from 1
+    num_pswfcs = 0
+
+    for site in structure.sites:
+        num_kind_pswfcs, semicore_offsets = kind_semicores[site.kind_name]
+        semicore_list.extend(num_pswfcs + offset for offset in semicore_offsets)
+        num_pswfcs += num_kind_pswfcs
+
     return semicore_list
 
 
@@ -168,6 +186,7 @@ def get_wannier_number_of_bands(
     only_valence=False,
     spin_polarized=False,
     spin_orbit_coupling: bool = False,
+    composition: ty.Optional[ty.Mapping[str, int]] = None,
 ):
     """Estimate number of bands for a Wannier90 calculation.
 
@@ -180,21 +199,26 @@ def get_wannier_number_of_bands(
     :type spin_polarized: bool
     :param spin_orbit_coupling: spin orbit coupling calculation?
     :type spin_orbit_coupling: bool
+    :param composition: ``structure.get_composition()``, computed if not provided
+    :type composition: dict
     :return: number of bands for Wannier90 SCDM
     :rtype: int
     """
-    from .upf import get_upf_content, is_soc_pseudo
+    from .upf import get_upf_metadata
 
-    if spin_orbit_coupling:
+    if composition is None:
         composition = structure.get_composition()
+
+    if spin_orbit_coupling:
         for kind in composition:
-            upf = pseudos[kind]
-            upf_content = get_upf_content(upf)
-            if not is_soc_pseudo(upf_content):
+            _, _, soc = get_upf_metadata(pseudos[kind])
+            if not soc:
                 raise ValueError("Should use SOC pseudo for SOC calculation")
 
-    num_electrons = get_number_of_electrons(structure, pseudos)
-    num_projections = get_number_of_projections(structure, pseudos, spin_orbit_coupling)
+    num_electrons = get_number_of_electrons(structure, pseudos, composition=composition)
+    num_projections = get_number_of_projections(
+        structure, pseudos, spin_orbit_coupling, composition=composition
+    )
     nspin = 2 if (spin_polarized or spin_orbit_coupling) else 1
     # TODO check nospin, spin, soc  # pylint: disable=fixme
     if only_valence:
@@ -214,6 +238,7 @@ def get_number_of_projections(
     structure: orm.StructureData,
     pseudos: ty.Mapping[str, orm.UpfData],
     spin_orbit_coupling: ty.Optional[bool] = None,
+    composition: ty.Optional[ty.Mapping[str, int]] = None,
 ) -> int:
     """Get number of projections for the structure with the given pseudopotential files.
 
@@ -224,12 +249,14 @@ def get_number_of_projections(
     :type structure: aiida.orm.StructureData
     :param pseudos: a dictionary contains orm.UpfData of the structure
     :type pseudos: dict
+    :param composition: ``structure.get_composition()``, computed if not provided
+    :type composition: dict
     :return: number of projections
     :rtype: int
     """
     import aiida_pseudo.data.pseudo.upf
 
-    from .upf import get_number_of_projections_from_upf, get_upf_content, is_soc_pseudo
+    from .upf import get_upf_metadata
 
     if not isinstance(structure, orm.StructureData):
         raise ValueError(
@@ -249,18 +276,17 @@ def get_number_of_projections(
             )
 
     # e.g. composition = {'Ga': 1, 'As': 1}
-    composition = structure.get_composition()
+    if composition is None:
+        composition = structure.get_composition()
 
     if spin_orbit_coupling is None:
         # I use the first pseudo to detect SOCs
         kind = list(composition.keys())[0]
-        spin_orbit_coupling = is_soc_pseudo(get_upf_content(pseudos[kind]))
+        _, _, spin_orbit_coupling = get_upf_metadata(pseudos[kind])
 
     tot_nprojs = 0
     for kind in composition:
-        upf = pseudos[kind]
-        nprojs = get_number_of_projections_from_upf(upf)
-        soc = is_soc_pseudo(get_upf_content(pseudos[kind]))
+        nprojs, _, soc = get_upf_metadata(pseudos[kind])
         if spin_orbit_coupling and not soc:
             # For SOC calculation with non-SOC pseudo, QE will generate
             # 2 PSWFCs from each one PSWFC in the pseudo
@@ -321,7 +347,9 @@ def get_projections(
 
 
 def get_number_of_electrons(
-    structure: orm.StructureData, pseudos: ty.Mapping[str, orm.UpfData]
+    structure: orm.StructureData,
+    pseudos: ty.Mapping[str, orm.UpfData],
+    composition: ty.Optional[ty.Mapping[str, int]] = None,
 ) -> float:
     """Get number of electrons for the structure based on pseudopotentials.
 
@@ -332,12 +360,14 @@ def get_number_of_electrons(
     :type structure: aiida.orm.StructureData
     :param pseudos: a dictionary contains orm.UpfData of the structure
     :type pseudos: dict
+    :param composition: ``structure.get_composition()``, computed if not provided
+    :type composition: dict
     :return: number of electrons
     :rtype: float
     """
     import aiida_pseudo.data.pseudo.upf
 
-    from .upf import get_number_of_electrons_from_upf
+    from .upf import get_upf_metadata
 
     if not isinstance(structure, orm.StructureData):
         raise ValueError(
@@ -358,10 +388,10 @@ def get_number_of_electrons(
 
     tot_nelecs = 0
     # e.g. composition = {'Ga': 1, 'As': 1}
-    composition = structure.get_composition()
+    if composition is None:
+        composition = structure.get_composition()
     for kind in composition:
-        upf = pseudos[kind]
-        nelecs = get_number_of_electrons_from_upf(upf)
+        _, nelecs, _ = get_upf_metadata(pseudos[kind])
         tot_nelecs += nelecs * composition[kind]
 
     return tot_nelecs
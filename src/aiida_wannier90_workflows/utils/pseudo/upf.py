@@ -1,5 +1,6 @@
 """Utility functions for parsing pseudo potential file."""
 
+import typing as ty
 import xml.etree.ElementTree as ET
 
 from aiida import orm
@@ -13,6 +14,7 @@ __all__ = (  # for the content of UPF, i.e. these functions accept str as parame
     "get_number_of_electrons_from_upf",
     "get_projections_from_upf",
     "get_number_of_projections_from_upf",
+    "get_upf_metadata",
     # for orm.StructreData, i.e. these functions accept orm.StructreData as parameter
     # 'get_number_of_electrons',
     # 'get_projections',
@@ -23,6 +25,9 @@ __all__ = (  # for the content of UPF, i.e. these functions accept str as parame
     # 'load_pseudo_metadata'
 )
 
+# Parsed metadata of stored UPF, keyed by UUID. Stored nodes are immutable so it is never stale.
+_UPF_METADATA_CACHE = {}
+
 
 def get_ppheader(upf_content: str) -> str:
     """Get PP_HEADER."""
@@ -473,3 +478,28 @@ def get_number_of_projections_from_upf(upf: orm.UpfData) -> int:
     """
     upf_content = get_upf_content(upf)
     return parse_number_of_pswfc(upf_content)
+
+
+def get_upf_metadata(upf: orm.UpfData) -> ty.Tuple[int, float, bool]:
+    """Return the number of PSWFC, the z_valence, and whether it is a SOC pseudo.
+
+    The UPF file of a stored pseudo is only parsed once, then the result is cached by UUID.
+
+    :param upf: the UPF file
+    :type upf: aiida.orm.UpfData
+    :return: number of projections, number of electrons, has spin-orbit coupling
+    :rtype: tuple
+    """
+    if upf.is_stored and upf.uuid in _UPF_METADATA_CACHE:
+        return _UPF_METADATA_CACHE[upf.uuid]
+
+    upf_content = get_upf_content(upf)
+    metadata = (
+        parse_number_of_pswfc(upf_content),
+        parse_zvalence(upf_content),
+        is_soc_pseudo(upf_content),
+    )
+    if upf.is_stored:
+        _UPF_METADATA_CACHE[upf.uuid] = metadata
+
+    return metadata
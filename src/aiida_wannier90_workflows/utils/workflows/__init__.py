@@ -5,17 +5,63 @@ from aiida import orm
 
 def get_last_calcjob(workchain: orm.WorkChainNode) -> orm.CalcJobNode:
     """Return the last CalcJob of a WorkChain."""
-    calcs = []
+    # The called links are not ordered, the latest calcjob has the largest PK
+    last_calcjob = max(
+        (
+            called_descendant
+            for called_descendant in workchain.called_descendants
+            if isinstance(called_descendant, orm.CalcJobNode)
+        ),
+        key=lambda _: _.pk,
+        default=None,
+    )
+
+    return last_calcjob
+
+
+def get_calcjob_inputs(calcjob: orm.CalcJobNode) -> dict:
+    """Return the input nodes of a CalcJob, nested by namespace.
+
+    All the input links are fetched in one query, while iterating `calcjob.inputs`
+    queries the links once for each link label.
+    """
+    from aiida.common import LinkType
+
+    return calcjob.base.links.get_incoming(link_type=LinkType.INPUT_CALC).nested()
+
+
+def clean_remote_folders(workchain: orm.WorkChainNode) -> list:
+    """Clean the remote folders of all the CalcJobs called by a WorkChain.
+
+    The remote folders are grouped by computer, so that a single transport
+    is opened for each computer instead of one for each remote folder.
+
+    :return: list of PKs of the CalcJobs whose remote folder is cleaned.
+    """
+    remote_folders = {}
     for called_descendant in workchain.called_descendants:
         if not isinstance(called_descendant, orm.CalcJobNode):
             continue
-        calcs.append(called_descendant)
-
-    if len(calcs) == 0:
-        return None
+        if "remote_folder" not in called_descendant.outputs:
+            continue
+        remote_folder = called_descendant.outputs.remote_folder
+        remote_folders.setdefault(remote_folder.computer.pk, []).append(
+            (called_descendant.pk, remote_folder)
+        )
 
-    # Sort by PK to get latest calcjob
-    calcs.sort(key=lambda _: _.pk)
-    last_calcjob = calcs[-1]
+    cleaned_calcs = []
+    for folders in remote_folders.values():
+        try:
+            with folders[0][1].get_authinfo().get_transport() as transport:
+                for pk, remote_folder in folders:
+                    try:
+                        remote_folder._clean(  # pylint: disable=protected-access
+                            transport=transport
+                        )
+                        cleaned_calcs.append(pk)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
 
-    return last_calcjob
+    return sorted(cleaned_calcs)
@@ -1,10 +1,18 @@
 #!/usr/bin/env python
 """Functions to generator relax/scf/nscf builder."""
+import typing as ty
+
 from aiida import orm
 from aiida.engine import ProcessBuilder
 
 from aiida_quantumespresso.common.types import SpinType
 
+# The pw.x `SYSTEM` flags for each spin type, the non-listed ones need no change
+_SPIN_FLAGS = {
+    SpinType.NON_COLLINEAR: {"noncolin": True},
+    SpinType.SPIN_ORBIT: {"noncolin": True, "lspinorb": True},
+}
+
 
 def get_relax_builder(
     code: orm.Code,
@@ -38,26 +46,51 @@ def get_relax_builder(
         code=code, overrides=overrides, **kwargs
     )
 
-    parameters = builder.base["pw"]["parameters"].get_dict()
-    if spin_type == SpinType.NON_COLLINEAR:
-        parameters["SYSTEM"]["noncolin"] = True
-    if spin_type == SpinType.SPIN_ORBIT:
-        parameters["SYSTEM"]["noncolin"] = True
-        parameters["SYSTEM"]["lspinorb"] = True
-    builder.base["pw"]["parameters"] = orm.Dict(parameters)
+    parameters = _set_spin_parameters(
+        builder.base["pw"]["parameters"].get_dict(), spin_type
+    )
+    builder.base["pw"]["parameters"] = _update_unstored_dict(
+        builder.base["pw"]["parameters"], parameters
+    )
 
     return builder
 
 
-def get_scf_builder(
+def _update_unstored_dict(node: orm.Dict, updates: dict) -> orm.Dict:
+    """Update the top-level keys of an unstored ``Dict`` in place.
+
+    A stored node is immutable, in that case a new ``Dict`` is returned.
+    """
+    if node.is_stored:
+        return orm.Dict({**node.get_dict(), **updates})
+
+    node.base.attributes.set_many(updates)
+
+    return node
+
+
+def _set_spin_parameters(parameters: dict, spin_type: SpinType) -> dict:
+    """Set the non-collinear and spin-orbit flags of pw.x parameters in place."""
+    spin_flags = _SPIN_FLAGS.get(spin_type)
+    if spin_flags:
+        parameters["SYSTEM"].update(spin_flags)
+
+    return parameters
+
+
+def _get_pw_base_builder(
     code: orm.Code,
     kpoints_distance: float = None,
     pseudo_family: str = None,
     spin_type: SpinType = SpinType.NONE,
     clean_workdir: bool = True,
     **kwargs,
-) -> ProcessBuilder:
-    """Generate a `PwBaseWorkChain` builder for scf, with or without SOC."""
+) -> ty.Tuple[ProcessBuilder, dict]:
+    """Generate a `PwBaseWorkChain` builder, with or without SOC.
+
+    The pw.x parameters are returned as a dict, so that the callers can further modify
+    them and only update the `Dict` node of the builder once.
+    """
     from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
 
     overrides = kwargs.pop("overrides", {})
@@ -79,13 +112,33 @@ def get_scf_builder(
         code=code, overrides=overrides, **kwargs
     )
 
-    parameters = builder["pw"]["parameters"].get_dict()
-    if spin_type == SpinType.NON_COLLINEAR:
-        parameters["SYSTEM"]["noncolin"] = True
-    if spin_type == SpinType.SPIN_ORBIT:
-        parameters["SYSTEM"]["noncolin"] = True
-        parameters["SYSTEM"]["lspinorb"] = True
-    builder["pw"]["parameters"] = orm.Dict(parameters)
+    parameters = _set_spin_parameters(
+        builder["pw"]["parameters"].get_dict(), spin_type
+    )
+
+    return builder, parameters
+
+
+def get_scf_builder(
+    code: orm.Code,
+    kpoints_distance: float = None,
+    pseudo_family: str = None,
+    spin_type: SpinType = SpinType.NONE,
+    clean_workdir: bool = True,
+    **kwargs,
+) -> ProcessBuilder:
+    """Generate a `PwBaseWorkChain` builder for scf, with or without SOC."""
+    builder, parameters = _get_pw_base_builder(
+        code=code,
+        kpoints_distance=kpoints_distance,
+        pseudo_family=pseudo_family,
+        spin_type=spin_type,
+        clean_workdir=clean_workdir,
+        **kwargs,
+    )
+    builder["pw"]["parameters"] = _update_unstored_dict(
+        builder["pw"]["parameters"], parameters
+    )
 
     # Currently only support magnetic with SOC
     # for magnetic w/o SOC, needs 2 separate wannier90 calculations for spin up and down.
@@ -120,7 +173,7 @@ def get_nscf_builder(  # pylint: disable=too-many-arguments
     if kpoints and kpoints_distance:
         raise ValueError("Cannot accept both `kpoints` and `kpoints_distance`")
 
-    builder = get_scf_builder(
+    builder, parameters = _get_pw_base_builder(
         code=code,
         kpoints_distance=kpoints_distance,
         pseudo_family=pseudo_family,
@@ -129,8 +182,6 @@ def get_nscf_builder(  # pylint: disable=too-many-arguments
         **kwargs,
     )
 
-    parameters = builder["pw"]["parameters"].get_dict()
-
     parameters["SYSTEM"]["nbnd"] = nbnd
 
     parameters["SYSTEM"]["nosym"] = True
@@ -145,7 +196,9 @@ def get_nscf_builder(  # pylint: disable=too-many-arguments
     # parameters['ELECTRONS']['diagonalization'] = 'david'
     parameters["ELECTRONS"]["diago_full_acc"] = True
 
-    builder["pw"]["parameters"] = orm.Dict(parameters)
+    builder["pw"]["parameters"] = _update_unstored_dict(
+        builder["pw"]["parameters"], parameters
+    )
 
     if kpoints:
         builder.pop("kpoints_distance", None)
@@ -10,6 +10,9 @@ from aiida_quantumespresso.workflows.pw.bands import PwBandsWorkChain
 
 from aiida_wannier90_workflows.workflows.bands import Wannier90BandsWorkChain
 
+# Inputs of the scf namespace that are not copied as they are to the bands builder
+_PWBANDS_EXCLUDED_INPUTS = frozenset(("pw",))
+
 
 def get_pwbands_builder_from_wannier(
     wannier_workchain: Wannier90BandsWorkChain,
@@ -36,11 +39,9 @@ def get_pwbands_builder_from_wannier(
     builder = PwBaseWorkChain.get_builder()
 
     # wannier_workchain.outputs['scf']['pw'] has no `structure`, I will fill it in later
-    excluded_inputs = ["pw"]
-    for key in scf_inputs:
-        if key in excluded_inputs:
-            continue
-        builder[key] = scf_inputs[key]
+    for key, value in scf_inputs.items():
+        if key not in _PWBANDS_EXCLUDED_INPUTS:
+            builder[key] = value
 
     structure = wannier_workchain.inputs["structure"]
     if "primitive_structure" in wannier_workchain.outputs:
@@ -11,6 +11,43 @@ from aiida_wannier90_workflows.common.types import (
 )
 
 
+# Default (disentanglement, frozen) types for each (electronic, projection) type.
+# For insulators the projection type is irrelevant, so the key uses `None`.
+_DEFAULT_TYPES = {
+    (ElectronicType.INSULATOR, None): (
+        WannierDisentanglementType.NONE,
+        WannierFrozenType.NONE,
+    ),
+    # No disentanglement when using SCDM, otherwise the wannier interpolated bands are wrong
+    (ElectronicType.METAL, WannierProjectionType.SCDM): (
+        WannierDisentanglementType.NONE,
+        WannierFrozenType.NONE,
+    ),
+    (ElectronicType.METAL, WannierProjectionType.ANALYTIC): (
+        WannierDisentanglementType.SMV,
+        WannierFrozenType.ENERGY_FIXED,
+    ),
+    (ElectronicType.METAL, WannierProjectionType.RANDOM): (
+        WannierDisentanglementType.SMV,
+        WannierFrozenType.ENERGY_FIXED,
+    ),
+    (ElectronicType.METAL, WannierProjectionType.ATOMIC_PROJECTORS_QE): (
+        WannierDisentanglementType.SMV,
+        WannierFrozenType.FIXED_PLUS_PROJECTABILITY,
+    ),
+    (ElectronicType.METAL, WannierProjectionType.ATOMIC_PROJECTORS_OPENMX): (
+        WannierDisentanglementType.SMV,
+        WannierFrozenType.FIXED_PLUS_PROJECTABILITY,
+    ),
+}
+
+# The cases where the default types are the only allowed ones, with the name used in error messages
+_REQUIRED_TYPES = {
+    (ElectronicType.INSULATOR, None): "insulators",
+    (ElectronicType.METAL, WannierProjectionType.SCDM): "SCDM",
+}
+
+
 def guess_wannier_projection_types(
     electronic_type: ElectronicType,
     projection_type: WannierProjectionType = None,
@@ -18,83 +55,44 @@ def guess_wannier_projection_types(
     frozen_type: WannierFrozenType = None,
 ) -> ty.Tuple[WannierProjectionType, WannierDisentanglementType, WannierFrozenType]:
     """Automatically guess Wannier projection, disentanglement, and frozen types."""
-    # pylint: disable=too-many-branches
-
     if electronic_type == ElectronicType.INSULATOR:
-        if disentanglement_type is None:
-            disentanglement_type = WannierDisentanglementType.NONE
-        elif disentanglement_type == WannierDisentanglementType.NONE:
-            pass
-        else:
+        key = (electronic_type, None)
+    elif electronic_type == ElectronicType.METAL:
+        key = (electronic_type, projection_type)
+    else:
+        raise ValueError(f"Not supported electronic type {electronic_type}")
+
+    if key not in _DEFAULT_TYPES:
+        if disentanglement_type is None or frozen_type is None:
             raise ValueError(
-                "For insulators there should be no disentanglement, "
+                "Cannot automatically guess disentanglement and frozen types "
+                f"from projection type: {projection_type}"
+            )
+        return projection_type, disentanglement_type, frozen_type
+
+    default_disentanglement_type, default_frozen_type = _DEFAULT_TYPES[key]
+    if disentanglement_type is None:
+        disentanglement_type = default_disentanglement_type
+    if frozen_type is None:
+        frozen_type = default_frozen_type
+
+    if key in _REQUIRED_TYPES:
+        name = _REQUIRED_TYPES[key]
+        if disentanglement_type != default_disentanglement_type:
+            raise ValueError(
+                f"For {name} there should be no disentanglement, "
                 f"current disentanglement type: {disentanglement_type}"
             )
-        if frozen_type is None:
-            frozen_type = WannierFrozenType.NONE
-        elif frozen_type == WannierFrozenType.NONE:
-            pass
-        else:
+        if frozen_type != default_frozen_type:
             raise ValueError(
-                f"For insulators there should be no frozen states, current frozen type: {frozen_type}"
+                f"For {name} there should be no frozen states, current frozen type: {frozen_type}"
             )
-    elif electronic_type == ElectronicType.METAL:
-        if projection_type == WannierProjectionType.SCDM:
-            if disentanglement_type is None:
-                # No disentanglement when using SCDM, otherwise the wannier interpolated bands are wrong
-                disentanglement_type = WannierDisentanglementType.NONE
-            elif disentanglement_type == WannierDisentanglementType.NONE:
-                pass
-            else:
-                raise ValueError(
-                    "For SCDM there should be no disentanglement, "
-                    f"current disentanglement type: {disentanglement_type}"
-                )
-            if frozen_type is None:
-                frozen_type = WannierFrozenType.NONE
-            elif frozen_type == WannierFrozenType.NONE:
-                pass
-            else:
-                raise ValueError(
-                    f"For SCDM there should be no frozen states, current frozen type: {frozen_type}"
-                )
-        elif projection_type in [
-            WannierProjectionType.ANALYTIC,
-            WannierProjectionType.RANDOM,
-        ]:
-            if disentanglement_type is None:
-                disentanglement_type = WannierDisentanglementType.SMV
-            if frozen_type is None:
-                frozen_type = WannierFrozenType.ENERGY_FIXED
-            if (
-                disentanglement_type == WannierDisentanglementType.NONE
-                and frozen_type != WannierFrozenType.NONE
-            ):
-                raise ValueError(
-                    f"Disentanglement is explicitly disabled but frozen type {frozen_type} is required"
-                )
-        elif projection_type in [
-            WannierProjectionType.ATOMIC_PROJECTORS_QE,
-            WannierProjectionType.ATOMIC_PROJECTORS_OPENMX,
-        ]:
-            if disentanglement_type is None:
-                disentanglement_type = WannierDisentanglementType.SMV
-            if frozen_type is None:
-                frozen_type = WannierFrozenType.FIXED_PLUS_PROJECTABILITY
-            if (
-                disentanglement_type == WannierDisentanglementType.NONE
-                and frozen_type != WannierFrozenType.NONE
-            ):
-                raise ValueError(
-                    f"Disentanglement is explicitly disabled but frozen type {frozen_type} is required"
-                )
-        else:
-            if disentanglement_type is None or frozen_type is None:
-                raise ValueError(
-                    "Cannot automatically guess disentanglement and frozen types "
-                    f"from projection type: {projection_type}"
-                )
-    else:
-        raise ValueError(f"Not supported electronic type {electronic_type}")
+    elif (
+        disentanglement_type == WannierDisentanglementType.NONE
+        and frozen_type != WannierFrozenType.NONE
+    ):
+        raise ValueError(
+            f"Disentanglement is explicitly disabled but frozen type {frozen_type} is required"
+        )
 
     return projection_type, disentanglement_type, frozen_type
@@ -16,14 +16,12 @@ def get_fermi_energy(output_parameters: orm.Dict) -> ty.Optional[float]:
     :return: if found return Fermi energy, else None. Unit is eV.
     :rtype: float, None
     """
-    out_dict = output_parameters.get_dict()
-    fermi = out_dict.get("fermi_energy", None)
-    fermi_units = out_dict.get("fermi_energy_units", None)
-
-    if fermi_units != "eV":
+    # Only fetch the two needed values instead of copying the whole output dict
+    attributes = output_parameters.base.attributes
+    if attributes.get("fermi_energy_units", None) != "eV":
         return None
 
-    return fermi
+    return attributes.get("fermi_energy", None)
 
 
 def get_fermi_energy_from_nscf(
@@ -1,14 +1,20 @@
 """AiiDA Wannier90 Workchains."""
 
-from .bands import Wannier90BandsWorkChain
-from .base.open_grid import OpenGridBaseWorkChain
-from .base.projwfc import ProjwfcBaseWorkChain
-from .base.pw2wannier90 import Pw2wannier90BaseWorkChain
-from .base.wannier90 import Wannier90BaseWorkChain
-from .open_grid import Wannier90OpenGridWorkChain
-from .optimize import Wannier90OptimizeWorkChain
-from .projwfcbands import ProjwfcBandsWorkChain
-from .wannier90 import Wannier90WorkChain
+import importlib
+
+# The workchain modules are imported on first access (PEP 562), so that importing
+# one of them does not import all the others.
+_WORKCHAIN_MODULES = {
+    "Wannier90BaseWorkChain": ".base.wannier90",
+    "OpenGridBaseWorkChain": ".base.open_grid",
+    "ProjwfcBaseWorkChain": ".base.projwfc",
+    "Pw2wannier90BaseWorkChain": ".base.pw2wannier90",
+    "Wannier90WorkChain": ".wannier90",
+    "Wannier90OpenGridWorkChain": ".open_grid",
+    "Wannier90BandsWorkChain": ".bands",
+    "Wannier90OptimizeWorkChain": ".optimize",
+    "ProjwfcBandsWorkChain": ".projwfcbands",
+}
 
 __all__ = (
     "Wannier90BaseWorkChain",
@@ -21,3 +27,20 @@ __all__ = (
     "Wannier90OptimizeWorkChain",
     "ProjwfcBandsWorkChain",
 )
+
+
+def __getattr__(name):
+    """Import the workchain class `name` from its module on first access."""
+    if name not in _WORKCHAIN_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(_WORKCHAIN_MODULES[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    """Return the module attributes, including the not yet imported workchains."""
+    return sorted(set(globals()) | set(__all__))
@@ -5,11 +5,11 @@ import typing as ty
 
 from aiida import orm
 from aiida.common.lang import type_check
-from aiida.engine import process_handler
 from aiida.engine.processes.builder import ProcessBuilder
 
 from aiida_quantumespresso.calculations.open_grid import OpenGridCalculation
-from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
+
+from aiida_wannier90_workflows.workflows.protocols.utils import ProtocolMixin
 
 from .qebaserestart import QeBaseRestartWorkChain
 
@@ -84,10 +84,3 @@ class OpenGridBaseWorkChain(ProtocolMixin, QeBaseRestartWorkChain):
         # pylint: enable=no-member
 
         return builder
-
-    @process_handler(
-        exit_codes=[_process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE]
-    )
-    def handle_output_stdout_incomplete(self, calculation):
-        """Overide parent function."""
-        return super().handle_output_stdout_incomplete(calculation)
@@ -5,11 +5,11 @@ import typing as ty
 
 from aiida import orm
 from aiida.common.lang import type_check
-from aiida.engine import process_handler
 from aiida.engine.processes.builder import ProcessBuilder
 
 from aiida_quantumespresso.calculations.projwfc import ProjwfcCalculation
-from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
+
+from aiida_wannier90_workflows.workflows.protocols.utils import ProtocolMixin
 
 from .qebaserestart import QeBaseRestartWorkChain
 
@@ -90,12 +90,3 @@ class ProjwfcBaseWorkChain(ProtocolMixin, QeBaseRestartWorkChain):
         # pylint: enable=no-member
 
         return builder
-
-    @process_handler(
-        exit_codes=[
-            _process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE
-        ]  # pylint: disable=no-member
-    )
-    def handle_output_stdout_incomplete(self, calculation):
-        """Overide parent function."""
-        return super().handle_output_stdout_incomplete(calculation)
@@ -6,15 +6,14 @@ import typing as ty
 from aiida import orm
 from aiida.common import AttributeDict
 from aiida.common.lang import type_check
-from aiida.engine import process_handler
 from aiida.engine.processes.builder import ProcessBuilder
 from aiida.orm.nodes.data.base import to_aiida_type
 
 from aiida_quantumespresso.calculations.pw2wannier90 import Pw2wannier90Calculation
 from aiida_quantumespresso.common.types import ElectronicType
-from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
 
 from aiida_wannier90_workflows.common.types import WannierProjectionType
+from aiida_wannier90_workflows.workflows.protocols.utils import ProtocolMixin
 
 from .qebaserestart import QeBaseRestartWorkChain
 
@@ -38,7 +37,7 @@ def validate_inputs(  # pylint: disable=unused-argument,inconsistent-return-stat
         return result
 
     calc_inputs = AttributeDict(inputs[Pw2wannier90BaseWorkChain._inputs_namespace])
-    calc_parameters = calc_inputs["parameters"].get_dict().get("inputpp", {})
+    calc_parameters = calc_inputs["parameters"].base.attributes.get("inputpp", {})
 
     scdm_proj = calc_parameters.get("scdm_proj", False)
     scdm_entanglement = calc_parameters.get("scdm_entanglement", "isolated")
@@ -234,10 +233,9 @@ class Pw2wannier90BaseWorkChain(ProtocolMixin, QeBaseRestartWorkChain):
         """
         from aiida_wannier90_workflows.utils.scdm import fit_scdm_mu_sigma
 
-        inputs = AttributeDict(
-            self.exposed_inputs(Pw2wannier90Calculation, self._inputs_namespace)
-        )
-        parameters = inputs["parameters"].get_dict().get("inputpp", {})
+        inputs = self.exposed_inputs(Pw2wannier90Calculation, self._inputs_namespace)
+        # Only read the `inputpp` namelist, the fitting below is skipped if possible
+        parameters = inputs["parameters"].base.attributes.get("inputpp", {})
 
         scdm_proj = parameters.get("scdm_proj", False)
         scdm_entanglement = parameters.get("scdm_entanglement", None)
@@ -270,17 +268,8 @@ class Pw2wannier90BaseWorkChain(ProtocolMixin, QeBaseRestartWorkChain):
 
             # If `scdm_mu` and/or `scdm_sigma` is present in the input parameters,
             # the workchain will directly use them, only the missing one will be populated.
-            if "scdm_mu" not in parameters:
-                parameters["scdm_mu"] = mu_new
-            if "scdm_sigma" not in parameters:
-                parameters["scdm_sigma"] = sigma_new
-            inputs["parameters"] = orm.Dict({"inputpp": parameters})
+            inputs["parameters"] = orm.Dict(
+                {"inputpp": {"scdm_mu": mu_new, "scdm_sigma": sigma_new, **parameters}}
+            )
 
         return inputs
-
-    @process_handler(
-        exit_codes=[_process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE]
-    )
-    def handle_output_stdout_incomplete(self, calculation):
-        """Overide parent function."""
-        return super().handle_output_stdout_incomplete(calculation)
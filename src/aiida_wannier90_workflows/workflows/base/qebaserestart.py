@@ -1,10 +1,13 @@
 """Wrapper workchain for BaseRestartWorkChain to automatically handle several QE errors."""
 
+import functools
+import inspect
+import os
 import re
+import typing as ty
 
 from aiida import orm
-from aiida.common import AttributeDict
-from aiida.engine import (  # pylint: disable=unused-import
+from aiida.engine import (
     BaseRestartWorkChain,
     ProcessHandlerReport,
     process_handler,
@@ -17,31 +20,103 @@ __all__ = [
     "QeBaseRestartWorkChain",
 ]
 
-# def process_handler_stdout_incomplete(func, **handler_kwargs):
-#     """A specific handler for `ERROR_OUTPUT_STDOUT_INCOMPLETE`.
-
-#     I cannot use
-#     ```
-#     @process_handler(exit_codes=[_process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE])
-#     def handle_output_stdout_incomplete(self, calculation):
-#     ```
-#     because in the definition `QeBaseRestartWorkChain._process_class = NamelistsCalculation`,
-#     so it will conplain that there is no exit code `ERROR_OUTPUT_STDOUT_INCOMPLETE`.
-#     With this decorator the exit code is retrieved dynamically to avoid this error.
-#     """
-#     def wrapper(**kwargs):
-#         _process_class = kwargs['self']
-#         exit_codes = [_process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE, ]
-#         handler_kwargs['exit_codes'] = exit_codes
-#         return process_handler(func(**kwargs), **handler_kwargs)
-#     return wrapper
+# Compiled once at import, the handler can be fired many times in a daemon worker
+_OOM_RE = re.compile(r"Detected \d+ oom-kill event\(s\) in step")
+_OOM_PATTERNS = (_OOM_RE.pattern, r"Out Of Memory")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_oom_database():
+    """Return a compiled `hyperscan` database of `_OOM_PATTERNS`, or None if not installed."""
+    try:
+        import hyperscan
+    except ImportError:
+        return None
+
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[_.encode() for _ in _OOM_PATTERNS],
+        ids=list(range(len(_OOM_PATTERNS))),
+        elements=len(_OOM_PATTERNS),
+        flags=hyperscan.HS_FLAG_SINGLEMATCH,
+    )
+    return database
+
+
+def _scan_out_of_memory(scheduler_stderr: str) -> bool:
+    """Return True if any of the `_OOM_PATTERNS` is found in the scheduler stderr.
+
+    All the patterns are matched in a single pass by `hyperscan` if it is installed,
+    otherwise fall back to substring tests and `re`.
+    """
+    database = _get_oom_database()
+    if database is None:
+        # Cheap substring tests on the whole buffer first, the regex is only
+        # needed when `oom-kill` appears but `Out Of Memory` does not.
+        return "Out Of Memory" in scheduler_stderr or (
+            "oom-kill" in scheduler_stderr
+            and _OOM_RE.search(scheduler_stderr) is not None
+        )
+
+    matches = []
+    database.scan(
+        scheduler_stderr.encode(),
+        match_event_handler=lambda pattern_id, *_: matches.append(pattern_id),
+    )
+    return len(matches) > 0
+
+
+# Units of the memory reported by `sacct`, in kB
+_MEMORY_UNITS_KB = {"K": 1, "M": 1024, "G": 1024**2, "T": 1024**3}
+
+
+def _get_max_rss_kb(calculation) -> ty.Optional[float]:
+    """Return the peak resident memory of one task of the calculation, in kB.
+
+    The value is the largest `MaxRSS` in the `sacct` output stored in the
+    `detailed_job_info` of the calculation, i.e. only available for SLURM.
+
+    :return: the peak memory per MPI process, or None if it was not reported.
+    """
+    detailed_job_info = calculation.get_detailed_job_info()
+    if not detailed_job_info or not detailed_job_info.get("stdout", None):
+        return None
+
+    # `sacct --parsable` output, the first line is the header
+    lines = [_ for _ in detailed_job_info["stdout"].splitlines() if _.strip()]
+    if not lines:
+        return None
+    header = lines[0].split("|")
+    if "MaxRSS" not in header:
+        return None
+    column = header.index("MaxRSS")
+
+    max_rss = None
+    for line in lines[1:]:
+        fields = line.split("|")
+        if column >= len(fields) or not fields[column].strip():
+            continue
+        value = fields[column].strip()
+        try:
+            if value[-1].upper() in _MEMORY_UNITS_KB:
+                rss = float(value[:-1]) * _MEMORY_UNITS_KB[value[-1].upper()]
+            else:
+                # In bytes
+                rss = float(value) / 1024
+        except ValueError:
+            continue
+        max_rss = rss if max_rss is None else max(max_rss, rss)
+
+    return max_rss
 
 
 class QeBaseRestartWorkChain(BaseRestartWorkChain):
     """Workchain to run a QE calculation with automated error handling and restarts.
 
     To handle Out-Of-Memory error, the `_process_class` needs to define the exit code
-    ``ERROR_OUTPUT_STDOUT_INCOMPLETE``.
+    ``ERROR_OUTPUT_STDOUT_INCOMPLETE``. The `handle_output_stdout_incomplete` handler is
+    registered in `define` with the exit code of the actual `_process_class`, so subclasses
+    only need to set `_process_class` and `_inputs_namespace`.
     """
 
     # When subclass this workchain, need to set these, e.g.
@@ -50,7 +125,32 @@ class QeBaseRestartWorkChain(BaseRestartWorkChain):
     _process_class = NamelistsCalculation
     _inputs_namespace = "base"
 
-    _mpi_proc_reduce_factor = 2
+    # Number of MPI processes is divided by 2**_mpi_proc_reduce_shift at each OOM restart
+    _mpi_proc_reduce_shift = 1
+    # Flags in `settings['cmdline']` whose values are reduced together with the MPI processes
+    _cmdline_parallel_flags = ("-nk", "-npools")
+
+    # When the peak memory per MPI process of the failed calculation is known, directly jump to
+    # the number of MPI processes per machine that fits in the memory of one machine, with this margin.
+    _oom_memory_safety_factor = 1.2
+
+    # OOM messages are printed at the end of the scheduler stderr, only read the tail of the file
+    _MAX_STDERR_BYTES = 65536
+
+    # If True and the computer uses a meta-scheduler which packs many jobs into an
+    # already reserved allocation (e.g. `aiida-hyperqueue`), the restarts with reduced
+    # number of MPI processes are dispatched into that allocation instead of waiting
+    # again in the queue of the underlying SLURM/PBS scheduler.
+    _pack_restarts = False
+    _packing_scheduler_types = ("hyperqueue", "fireworks")
+    # Resource keys used by the meta-schedulers for the number of MPI processes of one job,
+    # `num_mpiprocs_per_machine` is used for all the other schedulers.
+    _packed_resource_keys = ("num_mpiprocs", "num_cpus", "num_mpiprocs_per_machine")
+
+    @property
+    def _mpi_proc_reduce_factor(self) -> int:
+        """Return the factor to reduce the MPI processes, kept for backwards compatibility."""
+        return 1 << self._mpi_proc_reduce_shift
 
     @classmethod
     def define(cls, spec):
@@ -91,6 +191,46 @@ class QeBaseRestartWorkChain(BaseRestartWorkChain):
             message="The stdout output file was incomplete probably because the calculation got interrupted.",
         )
 
+        cls._register_handle_output_stdout_incomplete()
+
+    @classmethod
+    def _register_handle_output_stdout_incomplete(cls):
+        """Register `handle_output_stdout_incomplete` as a process handler of this class.
+
+        I cannot use
+        ```
+        @process_handler(exit_codes=[_process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE])
+        def handle_output_stdout_incomplete(self, calculation):
+        ```
+        because in the class body `QeBaseRestartWorkChain._process_class = NamelistsCalculation`,
+        which has no exit code `ERROR_OUTPUT_STDOUT_INCOMPLETE`, and each subclass would need to
+        redecorate the method. Here the exit code is retrieved from `cls._process_class` when the
+        spec of `cls` is defined.
+        """
+        exit_code = cls._process_class.exit_codes.get(
+            "ERROR_OUTPUT_STDOUT_INCOMPLETE", None
+        )
+        if exit_code is None:
+            return
+
+        func = inspect.getattr_static(cls, "handle_output_stdout_incomplete")
+        if getattr(func, "decorator", None) is process_handler and not hasattr(
+            func, "_unregistered_handler"
+        ):
+            # Explicitly decorated by a subclass, respect its exit codes
+            return
+        func = getattr(func, "_unregistered_handler", func)
+
+        # A new function for each class, since `process_handler` sets attributes on it
+        def handle_output_stdout_incomplete(self, calculation):
+            return func(self, calculation)
+
+        handle_output_stdout_incomplete.__doc__ = func.__doc__
+        handle_output_stdout_incomplete._unregistered_handler = func
+        cls.handle_output_stdout_incomplete = process_handler(exit_codes=[exit_code])(
+            handle_output_stdout_incomplete
+        )
+
     def setup(self):
         """Call the `setup` of the `BaseRestartWorkChain` and then create the inputs dictionary in `self.ctx.inputs`.
 
@@ -98,10 +238,100 @@ class QeBaseRestartWorkChain(BaseRestartWorkChain):
         the calculations in the internal loop.
         """
         super().setup()
-        self.ctx.inputs = AttributeDict(
-            self.exposed_inputs(self._process_class, self._inputs_namespace)
+        # `exposed_inputs` already builds a fresh `AttributeDict`, no need to copy it again.
+        self.ctx.inputs = self.exposed_inputs(
+            self._process_class, self._inputs_namespace
+        )
+        # Deserialize `settings` once, the error handler mutates this dict and
+        # only stores a new `Dict` node when the `cmdline` is actually changed.
+        if "settings" in self.ctx.inputs:
+            self.ctx.settings_dict = self.ctx.inputs["settings"].get_dict()
+
+        self.ctx.pack_restarts = self._pack_restarts and self.has_packing_scheduler()
+        # List of [num_mpiprocs_per_machine, peak memory per MPI process in kB] of the OOM calculations
+        self.ctx.oom_history = []
+        # Whether the scheduler stderr of a calculation reports an OOM error, keyed by pk
+        self.ctx.out_of_memory = {}
+
+    def has_packing_scheduler(self) -> bool:
+        """Return True if the computer of the code uses a scheduler which packs jobs into one allocation."""
+        code = self.ctx.inputs.get("code", None)
+        if code is None or code.computer is None:
+            return False
+
+        scheduler_type = code.computer.scheduler_type
+        return any(_ in scheduler_type for _ in self._packing_scheduler_types)
+
+    def get_scheduler_stderr_tail(self, calculation) -> str:
+        """Return the last `_MAX_STDERR_BYTES` of the scheduler stderr of a calculation.
+
+        :return: the tail of the scheduler stderr, or an empty string if it was not retrieved.
+        """
+        filename = calculation.get_option("scheduler_stderr")
+        retrieved = calculation.get_retrieved_node()
+        if filename is None or retrieved is None:
+            return ""
+
+        try:
+            with retrieved.base.repository.open(filename, mode="rb") as handle:
+                handle.seek(0, os.SEEK_END)
+                handle.seek(max(0, handle.tell() - self._MAX_STDERR_BYTES))
+                content = handle.read()
+        except FileNotFoundError:
+            return ""
+        except (OSError, ValueError):
+            # The stream is not seekable, read the whole file
+            content = calculation.get_scheduler_stderr() or ""
+            return content[-self._MAX_STDERR_BYTES :]
+
+        return content.decode("utf-8", errors="replace")
+
+    def is_out_of_memory(self, calculation) -> bool:
+        """Return True if the scheduler stderr of the calculation reports an out-of-memory error.
+
+        The result is stored in `self.ctx.out_of_memory`, so that the stderr of a calculation
+        is read and scanned only once.
+        """
+        key = str(calculation.pk)
+        if key not in self.ctx.out_of_memory:
+            scheduler_stderr = self.get_scheduler_stderr_tail(calculation)
+            self.ctx.out_of_memory[key] = _scan_out_of_memory(scheduler_stderr)
+
+        return self.ctx.out_of_memory[key]
+
+    def get_oom_num_mpiprocs_per_machine(
+        self, calculation, current_num_mpiprocs_per_machine: int
+    ) -> int:
+        """Return the number of MPI processes per machine for the restart of an OOM calculation.
+
+        By default the number is reduced by `2**_mpi_proc_reduce_shift`. If the peak memory per
+        MPI process of the calculation and the memory per machine are known, the number is further
+        reduced to what fits in the memory of one machine, to avoid several OOM restarts.
+        """
+        new_num_mpiprocs_per_machine = (
+            current_num_mpiprocs_per_machine >> self._mpi_proc_reduce_shift
         )
 
+        max_rss_kb = _get_max_rss_kb(calculation)
+        self.ctx.oom_history.append([current_num_mpiprocs_per_machine, max_rss_kb])
+        if not max_rss_kb:
+            return new_num_mpiprocs_per_machine
+
+        memory_per_machine_kb = self.ctx.inputs.metadata.options.get(
+            "max_memory_kb", None
+        )
+        if memory_per_machine_kb is None and calculation.computer is not None:
+            memory_per_machine_kb = (
+                calculation.computer.get_default_memory_per_machine()
+            )
+        if not memory_per_machine_kb:
+            return new_num_mpiprocs_per_machine
+
+        target = int(
+            memory_per_machine_kb / (max_rss_kb * self._oom_memory_safety_factor)
+        )
+        return max(1, min(new_num_mpiprocs_per_machine, target))
+
     def report_error_handled(self, calculation, action):
         """Report an action taken for a calculation that has failed.
 
@@ -114,70 +344,95 @@ class QeBaseRestartWorkChain(BaseRestartWorkChain):
         message += (
             f" with exit status {calculation.exit_status}: {calculation.exit_message}"
         )
+        message += f" | Action taken: {action}"
         self.report(message)
-        self.report(f"Action taken: {action}")
 
-    # @process_handler_stdout_incomplete
     def handle_output_stdout_incomplete(self, calculation):
         """Try to fix incomplete stdout error by reducing the number of cores.
 
         Often the ERROR_OUTPUT_STDOUT_INCOMPLETE is due to out-of-memory.
-        The handler will try to decrease `num_mpiprocs_per_machine` by `_mpi_proc_reduce_factor`.
+        The handler will try to decrease `num_mpiprocs_per_machine` by `2**_mpi_proc_reduce_shift`.
         """
-        regex = re.compile(r"Detected \d+ oom-kill event\(s\) in step")
-        scheduler_stderr = calculation.get_scheduler_stderr()
-        for line in scheduler_stderr.split("\n"):
-            if regex.search(line) or "Out Of Memory" in line:
-                break
-        else:
+        # Already filtered by the `process_handler` registration, but cheap to double check
+        exit_code = self._process_class.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE
+        if calculation.exit_status != exit_code.status:
+            return None
+
+        if not self.is_out_of_memory(calculation):
             action = "Unrecoverable incomplete stdout error"
             self.report_error_handled(calculation, action)
             return ProcessHandlerReport(
                 True, self.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE
             )
 
-        metadata = self.ctx.inputs["metadata"]
-        current_num_mpiprocs_per_machine = metadata["options"]["resources"].get(
-            "num_mpiprocs_per_machine", 1
-        )
+        resources = self.ctx.inputs.metadata.options.resources
+        resource_key = "num_mpiprocs_per_machine"
+        if self.ctx.pack_restarts:
+            resource_key = next(
+                (_ for _ in self._packed_resource_keys if _ in resources), resource_key
+            )
+        current_num_mpiprocs_per_machine = resources.get(resource_key, 1)
         # num_mpiprocs_per_machine = calculation.attributes['resources'].get('num_mpiprocs_per_machine', 1)
 
         if current_num_mpiprocs_per_machine == 1:
-            action = "Unrecoverable out-of-memory error after setting num_mpiprocs_per_machine to 1"
+            action = f"Unrecoverable out-of-memory error after setting {resource_key} to 1"
             self.report_error_handled(calculation, action)
             return ProcessHandlerReport(
                 True, self.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE
             )
 
-        new_num_mpiprocs_per_machine = (
-            current_num_mpiprocs_per_machine // self._mpi_proc_reduce_factor
-        )
-        metadata["options"]["resources"][
-            "num_mpiprocs_per_machine"
-        ] = new_num_mpiprocs_per_machine
-        action = f"Out-of-memory error, current num_mpiprocs_per_machine = {current_num_mpiprocs_per_machine}"
-        action += f", new num_mpiprocs_per_machine = {new_num_mpiprocs_per_machine}"
+        if resource_key == "num_mpiprocs_per_machine":
+            new_num_mpiprocs_per_machine = self.get_oom_num_mpiprocs_per_machine(
+                calculation, current_num_mpiprocs_per_machine
+            )
+        else:
+            new_num_mpiprocs_per_machine = (
+                current_num_mpiprocs_per_machine >> self._mpi_proc_reduce_shift
+            )
+        if new_num_mpiprocs_per_machine == current_num_mpiprocs_per_machine:
+            # Restarting with the same resources would fail again
+            action = f"Unrecoverable out-of-memory error, cannot reduce {resource_key} = {current_num_mpiprocs_per_machine}"
+            self.report_error_handled(calculation, action)
+            return ProcessHandlerReport(
+                True, self.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE
+            )
+        resources[resource_key] = new_num_mpiprocs_per_machine
+        action = f"Out-of-memory error, current {resource_key} = {current_num_mpiprocs_per_machine}"
+        action += f", new {resource_key} = {new_num_mpiprocs_per_machine}"
+        if self.ctx.pack_restarts:
+            action += ", restarting inside the allocation of the packing scheduler"
+        # `resources` is mutated in place, no need to reassign `self.ctx.inputs['metadata']`
         self.report_error_handled(calculation, action)
-        self.ctx.inputs["metadata"] = metadata
 
         if "settings" in self.ctx.inputs:
-            settings = self.ctx.inputs["settings"].get_dict()
+            settings = self.ctx.settings_dict
             # {'cmdline': ['-nk', '16']}, I need to reduce it as well
             cmdline = settings.get("cmdline", None)
             if cmdline:
-                for key in ("-nk", "-npools"):
-                    if key in cmdline:
-                        idx = cmdline.index(key)
-                        if idx + 1 > len(cmdline) - 1:
-                            # This should not happen, in this case the cmdline is wrong
-                            continue
-                        try:
-                            cmdline[idx + 1] = (
-                                f"{int(cmdline[idx + 1]) // self._mpi_proc_reduce_factor}"
+                changed = False
+                # The last token cannot be a flag followed by its value,
+                # in that case the cmdline is wrong and is left untouched.
+                flag_idx = {
+                    key: idx
+                    for idx, key in enumerate(cmdline[:-1])
+                    if key in self._cmdline_parallel_flags
+                }
+                # Reduce e.g. the number of pools by the same ratio as the MPI processes
+                for idx in flag_idx.values():
+                    try:
+                        value = int(cmdline[idx + 1])
+                        cmdline[idx + 1] = str(
+                            max(
+                                1,
+                                value
+                                * new_num_mpiprocs_per_machine
+                                // current_num_mpiprocs_per_machine,
                             )
-                        except ValueError:
-                            continue
-                settings["cmdline"] = cmdline
-                self.ctx.inputs["settings"] = orm.Dict(settings)
+                        )
+                    except ValueError:
+                        continue
+                    changed = True
+                if changed:
+                    self.ctx.inputs["settings"] = orm.Dict(settings)
 
         return ProcessHandlerReport(True)
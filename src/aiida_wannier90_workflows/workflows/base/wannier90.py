@@ -16,7 +16,6 @@ from aiida.engine.processes.builder import ProcessBuilder
 from aiida.orm.nodes.data.base import to_aiida_type
 
 from aiida_quantumespresso.common.types import ElectronicType, SpinType
-from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
 
 from aiida_wannier90.calculations import Wannier90Calculation
 
@@ -25,9 +24,18 @@ from aiida_wannier90_workflows.common.types import (
     WannierFrozenType,
     WannierProjectionType,
 )
+from aiida_wannier90_workflows.workflows.protocols.utils import ProtocolMixin
 
 __all__ = ["validate_inputs_base", "validate_inputs", "Wannier90BaseWorkChain"]
 
+# The energy windows of disentanglement, unused without a frozen window
+_DISENTANGLEMENT_WINDOW_KEYS = (
+    "dis_froz_min",
+    "dis_froz_max",
+    "dis_win_min",
+    "dis_win_max",
+)
+
 # pylint: disable=inconsistent-return-statements
 
 
@@ -239,6 +247,7 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         projection_type: WannierProjectionType = WannierProjectionType.ATOMIC_PROJECTORS_QE,
         disentanglement_type: WannierDisentanglementType = WannierDisentanglementType.SMV,
         frozen_type: WannierFrozenType = WannierFrozenType.FIXED_PLUS_PROJECTABILITY,
+        pseudo_orbitals: dict = None,
     ) -> ProcessBuilder:
         """Return a builder prepopulated with inputs selected according to the chosen protocol.
 
@@ -250,6 +259,9 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         :type protocol: str, optional
         :param overrides: [description], defaults to None
         :type overrides: dict, optional
+        :param pseudo_orbitals: the output of `get_pseudo_orbitals` for the pseudos of the
+            calculation, computed from the `pseudo_family` if not provided.
+        :type pseudo_orbitals: dict, optional
         :return: [description]
         :rtype: ProcessBuilder
         """
@@ -292,8 +304,9 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         inputs = cls.get_protocol_inputs(protocol, overrides)
 
         # Update the parameters based on the protocol inputs
-        parameters = inputs[cls._inputs_namespace]["parameters"]
-        metadata = inputs[cls._inputs_namespace]["metadata"]
+        calc_inputs = inputs[cls._inputs_namespace]
+        parameters = calc_inputs["parameters"]
+        metadata = calc_inputs["metadata"]
 
         meta_parameters = inputs.pop("meta_parameters")
         num_atoms = len(structure.sites)
@@ -310,6 +323,8 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         if pseudo_family is None:
             pseudo_family = meta_parameters["pseudo_family"]
         pseudos, _, _ = get_pseudo_and_cutoff(pseudo_family, structure)
+        # Walk the sites only once for all the counting below
+        composition = structure.get_composition()
 
         num_bands = get_wannier_number_of_bands(
             structure=structure,
@@ -318,11 +333,13 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
             only_valence=only_valence,
             spin_polarized=spin_polarized,
             spin_orbit_coupling=spin_orbit_coupling,
+            composition=composition,
         )
         num_projs = get_number_of_projections(
             structure=structure,
             pseudos=pseudos,
             spin_orbit_coupling=spin_orbit_coupling,
+            composition=composition,
         )
 
         if electronic_type == ElectronicType.INSULATOR:
@@ -330,16 +347,22 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         else:
             num_wann = num_projs
 
-        if meta_parameters["exclude_semicore"]:
+        exclude_semicore = meta_parameters["exclude_semicore"]
+        # Needed by both the semicores and the analytic projections, only get them once
+        if pseudo_orbitals is None and (
+            exclude_semicore or projection_type == WannierProjectionType.ANALYTIC
+        ):
             pseudo_orbitals = get_pseudo_orbitals(pseudos)
+
+        if exclude_semicore:
             semicore_list = get_semicore_list(
                 structure, pseudo_orbitals, spin_orbit_coupling
             )
             num_excludes = len(semicore_list)
-            # TODO I assume all the semicore bands are the lowest  # pylint: disable=fixme
-            exclude_pswfcs = range(1, num_excludes + 1)
             if num_excludes != 0:
-                parameters["exclude_bands"] = exclude_pswfcs
+                # TODO I assume all the semicore bands are the lowest  # pylint: disable=fixme
+                # Materialize the indices once, `orm.Dict` only accepts a list
+                parameters["exclude_bands"] = list(range(1, num_excludes + 1))
                 num_wann -= num_excludes
                 num_bands -= num_excludes
 
@@ -360,29 +383,29 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         ]:
             parameters["auto_projections"] = True
         elif projection_type == WannierProjectionType.ANALYTIC:
-            pseudo_orbitals = get_pseudo_orbitals(pseudos)
             projections = []
             for kind in structure.kinds:
-                for orb in pseudo_orbitals[kind.name]["pswfcs"]:
-                    if meta_parameters["exclude_semicore"]:
-                        if orb in pseudo_orbitals[kind.name]["semicores"]:
-                            continue
-                    projections.append(f"{kind.name}:{orb[-1].lower()}")
-            inputs[cls._inputs_namespace]["projections"] = orm.List(list=projections)
+                orbitals = pseudo_orbitals[kind.name]
+                semicores = orbitals["semicores"] if exclude_semicore else ()
+                projections.extend(
+                    f"{kind.name}:{orb[-1].lower()}"
+                    for orb in orbitals["pswfcs"]
+                    if orb not in semicores
+                )
+            calc_inputs["projections"] = orm.List(list=projections)
         elif projection_type == WannierProjectionType.RANDOM:
-            settings = inputs[cls._inputs_namespace].get("settings", {})
+            settings = calc_inputs.get("settings", {})
             settings.update({"random_projections": True})
-            inputs[cls._inputs_namespace]["settings"] = settings
+            calc_inputs["settings"] = settings
         else:
             raise ValueError(f"Unrecognized projection type {projection_type}")
 
         # Set disentanglement
         if disentanglement_type == WannierDisentanglementType.NONE:
+            # No frozen window to set up, only switch off the disentanglement iterations
             parameters["dis_num_iter"] = 0
-            parameters.pop("dis_froz_min", None)
-            parameters.pop("dis_froz_max", None)
-            parameters.pop("dis_win_min", None)
-            parameters.pop("dis_win_max", None)
+            for key in _DISENTANGLEMENT_WINDOW_KEYS:
+                parameters.pop(key, None)
         elif disentanglement_type == WannierDisentanglementType.SMV:
             if frozen_type == WannierFrozenType.ENERGY_FIXED:
                 inputs["shift_energy_windows"] = True
@@ -414,10 +437,8 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
                     }
                 )
             elif frozen_type == WannierFrozenType.NONE:
-                parameters.pop("dis_froz_min", None)
-                parameters.pop("dis_froz_max", None)
-                parameters.pop("dis_win_min", None)
-                parameters.pop("dis_win_max", None)
+                for key in _DISENTANGLEMENT_WINDOW_KEYS:
+                    parameters.pop(key, None)
             else:
                 raise ValueError(f"Not supported frozen type: {frozen_type}")
         else:
@@ -439,30 +460,24 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
 
         # If overrides are provided, they take precedence over default values
         if overrides:
-            parameter_overrides = overrides.get(cls._inputs_namespace, {}).get(
-                "parameters", {}
-            )
-            parameters = recursive_merge(parameters, parameter_overrides)
-            metadata_overrides = overrides.get(cls._inputs_namespace, {}).get(
-                "metadata", {}
+            calc_overrides = overrides.get(cls._inputs_namespace, {})
+            parameters = recursive_merge(
+                parameters, calc_overrides.get("parameters", {})
             )
-            metadata = recursive_merge(metadata, metadata_overrides)
+            metadata = recursive_merge(metadata, calc_overrides.get("metadata", {}))
 
         # pylint: disable=no-member
         builder = cls.get_builder()
-        builder[cls._inputs_namespace]["code"] = code
-        builder[cls._inputs_namespace]["structure"] = structure
-        builder[cls._inputs_namespace]["kpoints"] = inputs["kpoints"]
-        builder[cls._inputs_namespace]["parameters"] = orm.Dict(parameters)
-        builder[cls._inputs_namespace]["metadata"] = metadata
-        if "projections" in inputs[cls._inputs_namespace]:
-            builder[cls._inputs_namespace]["projections"] = inputs[
-                cls._inputs_namespace
-            ]["projections"]
-        if "settings" in inputs[cls._inputs_namespace]:
-            builder[cls._inputs_namespace]["settings"] = orm.Dict(
-                dict=inputs[cls._inputs_namespace]["settings"]
-            )
+        calc_builder = builder[cls._inputs_namespace]
+        calc_builder["code"] = code
+        calc_builder["structure"] = structure
+        calc_builder["kpoints"] = inputs["kpoints"]
+        calc_builder["parameters"] = orm.Dict(parameters)
+        calc_builder["metadata"] = metadata
+        if "projections" in calc_inputs:
+            calc_builder["projections"] = calc_inputs["projections"]
+        if "settings" in calc_inputs:
+            calc_builder["settings"] = orm.Dict(dict=calc_inputs["settings"])
         if "settings" in inputs:
             builder["settings"] = orm.Dict(inputs["settings"])
         builder["clean_workdir"] = orm.Bool(inputs["clean_workdir"])
@@ -497,27 +512,27 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         Different from `get_builder_from_protocol', this function is executed at runtime.
         """
         # pylint: disable=too-many-statements,too-many-locals,too-many-branches
-        import numpy as np
-
         from aiida_wannier90_workflows.utils.bands import (
             get_homo_lumo,
             remove_exclude_bands,
         )
         from aiida_wannier90_workflows.utils.scdm import get_energy_of_projectability
 
-        inputs = AttributeDict(
-            self.exposed_inputs(Wannier90Calculation, self._inputs_namespace)
-        )
+        inputs = self.exposed_inputs(Wannier90Calculation, self._inputs_namespace)
         parameters = inputs.parameters.get_dict()
+        # Only create a new `Dict` node if the parameters are changed
+        modified = False
+
+        # The bands array is read from the repository only once, and shared by the steps below
+        bands = self.inputs.bands.get_bands() if "bands" in self.inputs else None
 
         if self.inputs.shift_energy_windows:
             fermi_energy = parameters["fermi_energy"]
             # For metal, we shift the four parameters by Fermi energy.
             shift_energy = fermi_energy
-            if "bands" in self.inputs:
+            if bands is not None:
                 # Check the system is metal or insulator.
                 # For insulator, we shift them by the minimum of LUMO.
-                bands = self.inputs.bands.get_bands()
                 homo, lumo = get_homo_lumo(bands, fermi_energy)
                 bandgap = lumo - homo
                 if bandgap > 1e-3:
@@ -527,6 +542,7 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
             for key in keys:
                 if key in parameters:
                     parameters[key] += shift_energy
+                    modified = True
 
         # Auto set `dis_froz_max`
         if self.inputs.auto_energy_windows:
@@ -536,30 +552,31 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
                 thresholds=self.inputs.auto_energy_windows_threshold.value,
             )
             parameters["dis_froz_max"] = dis_froz_max
+            modified = True
 
         # Prevent error:
         #   dis_windows: More states in the frozen window than target WFs
-        if "dis_froz_max" in parameters and "bands" in self.inputs:
-            bands = self.inputs.bands.get_bands()
+        if "dis_froz_max" in parameters and bands is not None:
             if parameters.get("exclude_bands", None):
                 # Index of parameters['exclude_bands'] starts from 1,
                 # I need to change it to 0-based
                 exclude_bands = [_ - 1 for _ in parameters["exclude_bands"]]
                 bands = remove_exclude_bands(bands=bands, exclude_bands=exclude_bands)
-            highest_band = bands[:, min(parameters["num_wann"], bands.shape[1]) - 1]
+            num_wann = parameters["num_wann"]
             # This is the energy to freeze all the num_wann bands
-            max_froz_energy = np.max(highest_band)
+            max_froz_energy = bands[:, min(num_wann, bands.shape[1]) - 1].max()
             # Cannot freeze more bands than num_wann,
             # this sets the upper limit of `dis_froz_max`.
-            if bands.shape[1] > parameters["num_wann"]:
-                min_next_band = np.min(bands[:, parameters["num_wann"]])
+            if bands.shape[1] > num_wann:
+                min_next_band = bands[:, num_wann].min()
                 # I subtract a small value for safety
                 min_next_band -= 1e-4
                 max_froz_energy = min(max_froz_energy, min_next_band)
             # `dis_froz_max` should be smaller than this max_froz_energy
             # to allow doing disentanglement
-            dis_froz_max = min(max_froz_energy, parameters["dis_froz_max"])
-            parameters["dis_froz_max"] = dis_froz_max
+            if max_froz_energy < parameters["dis_froz_max"]:
+                parameters["dis_froz_max"] = max_froz_energy
+                modified = True
 
         # quick and hacky way to enable guiding_centres while still using
         # auto_projections = True in the nnkp step
@@ -576,8 +593,10 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
             parameters.pop("auto_projections", None)
             parameters["guiding_centres"] = True
             inputs.projections = self.inputs.guiding_centres_projections
+            modified = True
 
-        inputs.parameters = orm.Dict(parameters)
+        if modified:
+            inputs.parameters = orm.Dict(parameters)
 
         if "remote_input_folder" in inputs and "settings" in self.inputs:
             # Note there is an `additional_remote_symlink_list` in Wannier90Calculation.inputs.settings,
@@ -628,8 +647,8 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
         message += (
             f" with exit status {calculation.exit_status}: {calculation.exit_message}"
         )
+        message += f" | Action taken: {action}"
         self.report(message)
-        self.report(f"Action taken: {action}")
 
     @process_handler(exit_codes=[Wannier90Calculation.exit_codes.ERROR_BVECTORS])
     def handle_bvectors(self, calculation) -> ProcessHandlerReport:
@@ -692,7 +711,7 @@ class Wannier90BaseWorkChain(ProtocolMixin, BaseRestartWorkChain):
             )
 
         current_disprojmin = parameters.get(
-            "dis_proj_min", self._WANNIER90_DEFAULT_KMESH_TOL
+            "dis_proj_min", self._WANNIER90_DEFAULT_DIS_PROJ_MIN
         )
         multiplier = self.ctx.disprojmin_multipliers.pop(0)
         new_disprojmin = current_disprojmin * multiplier
@@ -5,7 +5,6 @@ import pathlib
 import typing as ty
 
 from aiida import orm
-from aiida.common import AttributeDict
 from aiida.engine.processes import ProcessBuilder, ToContext, if_
 
 from aiida_quantumespresso.utils.mapping import prepare_process_inputs
@@ -195,15 +194,13 @@ class Wannier90OpenGridWorkChain(Wannier90WorkChain):
 
     def run_open_grid(self):
         """Use QE open_grid.x to unfold irreducible kmesh to a full kmesh."""
-        inputs = AttributeDict(
-            self.exposed_inputs(OpenGridBaseWorkChain, namespace="open_grid")
-        )
+        inputs = self.exposed_inputs(OpenGridBaseWorkChain, namespace="open_grid")
         inputs.open_grid.parent_folder = self.ctx.current_folder
         inputs.metadata.call_link_label = "open_grid"
 
         inputs = prepare_process_inputs(OpenGridBaseWorkChain, inputs)
         running = self.submit(OpenGridBaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}>")
+        self.report_launched(running)
 
         return ToContext(workchain_open_grid=running)
 
@@ -4,8 +4,6 @@ import pathlib
 import typing as ty
 import warnings
 
-import numpy as np
-
 from aiida import orm
 from aiida.engine import ProcessBuilder, ToContext, append_, if_, while_
 from aiida.orm.nodes.data.base import to_aiida_type
@@ -13,7 +11,10 @@ from aiida.orm.nodes.data.base import to_aiida_type
 from aiida_quantumespresso.utils.mapping import prepare_process_inputs
 
 from aiida_wannier90_workflows.common.types import WannierProjectionType
-from aiida_wannier90_workflows.utils.workflows import get_last_calcjob
+from aiida_wannier90_workflows.utils.workflows import (
+    get_calcjob_inputs,
+    get_last_calcjob,
+)
 
 from .bands import Wannier90BandsWorkChain
 from .base.wannier90 import Wannier90BaseWorkChain
@@ -104,6 +105,8 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
     @classmethod
     def define(cls, spec):
         """Define the process spec."""
+        import numpy as np
+
         super().define(spec)
 
         spec.input(
@@ -356,15 +359,15 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
         self.ctx.saved_parameters = {}
         if self.inputs["separate_plotting"]:
             parameters = self.inputs.wannier90.wannier90["parameters"].get_dict()
-            # I convert the tuple to list so it can be changed
-            excluded_inputs = list(Wannier90OptimizeWorkChain._WANNIER90_PLOT_INPUTS)
-            for key in excluded_inputs:
+            for key in Wannier90OptimizeWorkChain._WANNIER90_PLOT_INPUTS:
                 plot_input = parameters.get(key, False)
                 if plot_input:
                     self.ctx.saved_parameters[key] = plot_input
 
     def should_run_wannier90_optimize(self):
         """Whether should optimize dis_proj_min/max."""
+        import numpy as np
+
         if not self.inputs["optimize_disproj"]:
             return False
 
@@ -459,7 +462,7 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
         inputs["metadata"] = {"call_link_label": "wannier90"}
         inputs = prepare_process_inputs(Wannier90BaseWorkChain, inputs)
         running = self.submit(Wannier90BaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}>")
+        self.report_launched(running)
 
         return ToContext(workchain_wannier90=running)
 
@@ -489,9 +492,12 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
         # resources = base_inputs['wannier90']['wannier90']['metadata']['options']['resources']
 
         # Use the Wannier90BaseWorkChain-corrected parameters, especially `num_mpiprocs_per_machine`
-        last_calc = get_last_calcjob(self.ctx.workchain_wannier90)
-        for key in last_calc.inputs:
-            inputs[key] = last_calc.inputs[key]
+        if "last_wannier90_calc" not in self.ctx:
+            self.ctx.last_wannier90_calc = get_last_calcjob(
+                self.ctx.workchain_wannier90
+            )
+        last_calc = self.ctx.last_wannier90_calc
+        inputs.update(get_calcjob_inputs(last_calc))
 
         parameters = inputs.parameters.get_dict()
 
@@ -577,6 +583,8 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
 
     def inspect_wannier90_optimize_final(self):
         """Select the optimal choice for dis_proj_min/max."""
+        import numpy as np
+
         if not self.has_run_wannier90_optimize():
             return
 
@@ -643,8 +651,7 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
             optimal_workchain = self.ctx.workchain_wannier90
         # Copy inputs, especially the `dis_proj_min/max` might have been corrected
         last_calc = get_last_calcjob(optimal_workchain)
-        for key in last_calc.inputs:
-            inputs[key] = last_calc.inputs[key]
+        inputs.update(get_calcjob_inputs(last_calc))
 
         # Use `current_folder` which points to the optimal wannier90 folder, since we need the chk file.
         # However we need to explicitly
@@ -694,7 +701,7 @@ class Wannier90OptimizeWorkChain(Wannier90BandsWorkChain):
 
         inputs = prepare_process_inputs(Wannier90BaseWorkChain, inputs)
         running = self.submit(Wannier90BaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}> in plotting mode")
+        self.report_launched(running, mode="plotting")
 
         return ToContext(workchain_wannier90_plot=running)
 
@@ -792,6 +799,8 @@ def get_spreads_imbalence(wannier_functions_output: dict) -> float:
     :return: [description]
     :rtype: float
     """
+    import numpy as np
+
     spreads = [_["wf_spreads"] for _ in wannier_functions_output]
     var = np.var(spreads)
 
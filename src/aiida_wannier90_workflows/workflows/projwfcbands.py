@@ -4,7 +4,6 @@ import pathlib
 import typing as ty
 
 from aiida import orm
-from aiida.common import AttributeDict
 from aiida.common.lang import type_check
 from aiida.engine import ProcessBuilder, ToContext, if_
 
@@ -147,9 +146,7 @@ class ProjwfcBandsWorkChain(PwBandsWorkChain):
 
     def run_projwfc(self):
         """Run projwfc.x."""
-        inputs = AttributeDict(
-            self.exposed_inputs(ProjwfcBaseWorkChain, namespace="projwfc")
-        )
+        inputs = self.exposed_inputs(ProjwfcBaseWorkChain, namespace="projwfc")
         inputs.metadata.call_link_label = "projwfc"
         inputs.clean_workdir = orm.Bool(False)
 
@@ -0,0 +1,33 @@
+"""Utilities for the protocols of the workchains."""
+
+from copy import deepcopy
+import functools
+
+from aiida_quantumespresso.workflows.protocols.utils import (
+    ProtocolMixin as _ProtocolMixin,
+)
+
+__all__ = ("ProtocolMixin",)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_yaml(filepath) -> dict:
+    """Load a protocol ``.yaml`` file, the file is only parsed once."""
+    import yaml
+
+    with filepath.open() as file:
+        return yaml.safe_load(file)
+
+
+class ProtocolMixin(_ProtocolMixin):
+    """`ProtocolMixin` which only parses the protocol file of each workchain once.
+
+    The protocol inputs are re-generated for every `get_builder_from_protocol`, also for
+    all the sub workchains, but the content of the protocol files never changes.
+    """
+
+    @classmethod
+    def _load_protocol_file(cls) -> dict:
+        """Return the contents of the protocol file for workflow class."""
+        # `recursive_merge` modifies its first argument in-place, so return a copy
+        return deepcopy(_load_yaml(cls.get_protocol_filepath()))
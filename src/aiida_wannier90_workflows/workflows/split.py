@@ -4,8 +4,6 @@ import copy
 import pathlib
 import typing as ty
 
-import numpy as np
-
 from aiida import orm
 from aiida.common import AttributeDict
 from aiida.engine import ProcessBuilder, ToContext, WorkChain, if_
@@ -20,10 +18,6 @@ from aiida_wannier90_workflows.common.types import (
     WannierFrozenType,
     WannierProjectionType,
 )
-from aiida_wannier90_workflows.utils.bands import get_homo_lumo
-from aiida_wannier90_workflows.utils.workflows.plot.bands import (
-    get_workchain_fermi_energy,
-)
 from aiida_wannier90_workflows.workflows.base.wannier90 import Wannier90BaseWorkChain
 from aiida_wannier90_workflows.workflows.optimize import Wannier90OptimizeWorkChain
 
@@ -355,6 +349,8 @@ class Wannier90SplitWorkChain(WorkChain):  # pylint: disable=too-many-public-met
     def setup(self):
         """Define the current structure in the context to be the input structure."""
 
+        self.ctx.clean_workdir = self.inputs.clean_workdir.value
+
         self.ctx.ref_bands = self.inputs["valcond"].get(
             "optimize_reference_bands", None
         )
@@ -381,6 +377,12 @@ class Wannier90SplitWorkChain(WorkChain):  # pylint: disable=too-many-public-met
 
     def inspect_valcond(self):  # pylint: disable=inconsistent-return-statements
         """Overide parent."""
+        import numpy as np
+
+        from aiida_wannier90_workflows.utils.bands import get_homo_lumo
+        from aiida_wannier90_workflows.utils.workflows.plot.bands import (
+            get_workchain_fermi_energy,
+        )
 
         workchain = self.ctx.workchain_valcond
 
@@ -705,21 +707,21 @@ class Wannier90SplitWorkChain(WorkChain):  # pylint: disable=too-many-public-met
 
     def on_terminated(self):
         """Clean the working directories of all child calculations if `clean_workdir=True` in the inputs."""
+        from aiida_wannier90_workflows.utils.workflows import clean_remote_folders
+
         super().on_terminated()
 
-        if not self.inputs.clean_workdir:
+        # The process might be terminated before `setup`
+        if "clean_workdir" in self.ctx:
+            clean_workdir = self.ctx.clean_workdir
+        else:
+            clean_workdir = self.inputs.clean_workdir.value
+
+        if not clean_workdir:
             self.report("remote folders will not be cleaned")
             return
 
-        cleaned_calcs = []
-
-        for called_descendant in self.node.called_descendants:
-            if isinstance(called_descendant, orm.CalcJobNode):
-                try:
-                    called_descendant.outputs.remote_folder._clean()  # pylint: disable=protected-access
-                    cleaned_calcs.append(called_descendant.pk)
-                except (OSError, KeyError):
-                    pass
+        cleaned_calcs = clean_remote_folders(self.node)
 
         if cleaned_calcs:
             self.report(
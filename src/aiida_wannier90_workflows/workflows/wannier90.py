@@ -1,21 +1,19 @@
 """Base class for Wannierisation workflow."""
 
 # pylint: disable=protected-access
+import functools
 import pathlib
 import typing as ty
 
 from aiida import orm
-from aiida.common import AttributeDict
 from aiida.common.lang import type_check
+from aiida.common.log import LOG_LEVEL_REPORT
 from aiida.engine.processes import ProcessBuilder, ToContext, WorkChain, if_
 from aiida.orm.nodes.data.base import to_aiida_type
 
 from aiida_quantumespresso.common.types import ElectronicType, SpinType
 from aiida_quantumespresso.utils.mapping import prepare_process_inputs
-from aiida_quantumespresso.workflows.protocols.utils import (
-    ProtocolMixin,
-    recursive_merge,
-)
+from aiida_quantumespresso.workflows.protocols.utils import recursive_merge
 from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
 
 from aiida_wannier90_workflows.common.types import (
@@ -23,6 +21,7 @@ from aiida_wannier90_workflows.common.types import (
     WannierFrozenType,
     WannierProjectionType,
 )
+from aiida_wannier90_workflows.workflows.protocols.utils import ProtocolMixin
 
 from .base.projwfc import ProjwfcBaseWorkChain
 from .base.pw2wannier90 import Pw2wannier90BaseWorkChain
@@ -55,6 +54,37 @@ def validate_inputs(  # pylint: disable=unused-argument,inconsistent-return-stat
         return "`auto_energy_windows` and `shift_energy_windows` are incompatible"
 
 
+@functools.lru_cache(maxsize=None)
+def _load_protocol_overrides() -> dict:
+    """Load the ``overrides`` file of the protocols of `Wannier90WorkChain`."""
+    from importlib_resources import files
+    import yaml
+
+    from . import protocols
+
+    path = files(protocols) / "overrides" / "wannier90.yaml"
+    with path.open() as file:
+        return yaml.safe_load(file)
+
+
+def inspect_pending_then(step):
+    """Return an outline step which inspects the pending sub process, then runs the `step`.
+
+    The `step` is looked up by name, so that it can be overridden in derived classes.
+    """
+    name = step.__name__
+
+    def inspect_and_run(self):
+        result = self.inspect_pending()
+        if result:
+            return result
+        return getattr(self, name)()
+
+    inspect_and_run.__name__ = f"inspect_pending_then_{name}"
+
+    return inspect_and_run
+
+
 # pylint: disable=fixme,too-many-lines
 class Wannier90WorkChain(
     ProtocolMixin, WorkChain
@@ -90,6 +120,17 @@ class Wannier90WorkChain(
                 "at the end of execution."
             ),
         )
+        spec.input(
+            "perform_sanity_checks",
+            valid_type=orm.Bool,
+            serializer=to_aiida_type,
+            default=lambda: orm.Bool(True),
+            help=(
+                "If True, check the number of projections and electrons against the QE outputs "
+                "at the end of execution. This requires parsing the pseudopotentials, "
+                "set to False to skip it in high-throughput runs."
+            ),
+        )
         spec.expose_inputs(
             PwBaseWorkChain,
             namespace="scf",
@@ -143,25 +184,21 @@ class Wannier90WorkChain(
 
         spec.outline(
             cls.setup,
+            # Each step saves a checkpoint, so the inspection of a sub process is merged
+            # into the step launching the next one.
             if_(cls.should_run_scf)(
                 cls.run_scf,
-                cls.inspect_scf,
             ),
             if_(cls.should_run_nscf)(
-                cls.run_nscf,
-                cls.inspect_nscf,
+                inspect_pending_then(cls.run_nscf),
             ),
             if_(cls.should_run_projwfc)(
-                cls.run_projwfc,
-                cls.inspect_projwfc,
+                inspect_pending_then(cls.run_projwfc),
             ),
-            cls.run_wannier90_pp,
-            cls.inspect_wannier90_pp,
-            cls.run_pw2wannier90,
-            cls.inspect_pw2wannier90,
-            cls.run_wannier90,
-            cls.inspect_wannier90,
-            cls.results,
+            inspect_pending_then(cls.run_wannier90_pp),
+            inspect_pending_then(cls.run_pw2wannier90),
+            inspect_pending_then(cls.run_wannier90),
+            inspect_pending_then(cls.results),
         )
 
         spec.expose_outputs(
@@ -224,15 +261,13 @@ class Wannier90WorkChain(
 
     @classmethod
     def get_protocol_overrides(cls) -> dict:
-        """Get the ``overrides`` for various input arguments of the ``get_builder_from_protocol()`` method."""
-        from importlib_resources import files
-        import yaml
+        """Get the ``overrides`` for various input arguments of the ``get_builder_from_protocol()`` method.
 
-        from . import protocols
+        The file is only parsed once, a copy is returned since `recursive_merge` modifies its arguments.
+        """
+        from copy import deepcopy
 
-        path = files(protocols) / "overrides" / "wannier90.yaml"
-        with path.open() as file:
-            return yaml.safe_load(file)
+        return deepcopy(_load_protocol_overrides())
 
     @classmethod
     def get_builder_from_protocol(  # pylint: disable=unused-argument
@@ -290,7 +325,6 @@ class Wannier90WorkChain(
                 for WannierProjectionType.ANALYTIC/RANDOM, use WannierFrozenType.ENERGY_FIXED
                 for WannierProjectionType.ATOMIC_PROJECTORS_QE/OPENMX, use WannierFrozenType.FIXED_PLUS_PROJECTABILITY
                 for WannierProjectionType.SCDM, use WannierFrozenType.NONE
-        :param maximal_localisation: if true do maximal localisation of Wannier functions.
         :param exclude_semicores: if True do not Wannierise semicore states.
         :param plot_wannier_functions: if True plot Wannier functions as xsf files.
         :param retrieve_hamiltonian: if True retrieve Wannier Hamiltonian.
@@ -401,7 +435,7 @@ class Wannier90WorkChain(
                 protocol_overrides["spin_noncollinear"], overrides
             )
             pw_spin_type = SpinType.NONE
-        elif spin_type == SpinType.SPIN_ORBIT:
+        elif spin_orbit_coupling:
             overrides = recursive_merge(protocol_overrides["spin_orbit"], overrides)
             pw_spin_type = SpinType.NONE
         else:
@@ -413,12 +447,38 @@ class Wannier90WorkChain(
         builder.structure = structure
         builder.clean_workdir = orm.Bool(inputs.get("clean_workdir"))
 
+        # Prepare SCF builder
+        scf_overrides = inputs.get("scf", {})
+        scf_overrides["pseudo_family"] = pseudo_family
+        scf_builder = PwBaseWorkChain.get_builder_from_protocol(
+            code=codes["pw"],
+            structure=structure,
+            protocol=protocol,
+            overrides=scf_overrides,
+            electronic_type=electronic_type,
+            spin_type=pw_spin_type,
+        )
+        # Remove workchain excluded inputs
+        scf_builder["pw"].pop("structure", None)
+        scf_builder.pop("clean_workdir", None)
+        builder.scf = scf_builder._inputs(prune=True)
+
         # Prepare wannier90 builder
         wannier_overrides = inputs.get("wannier90", {})
         wannier_overrides.setdefault("meta_parameters", {})
         wannier_overrides["meta_parameters"].setdefault(
             "exclude_semicore", exclude_semicore
         )
+        # The pseudo orbitals are needed for the semicores and the analytic projections,
+        # get them once from the scf pseudos, so that the semicores excluded by
+        # wannier90 and pw2wannier90 are always consistent.
+        pseudo_orbitals = None
+        if (
+            exclude_semicore
+            or wannier_overrides["meta_parameters"]["exclude_semicore"]
+            or projection_type == WannierProjectionType.ANALYTIC
+        ):
+            pseudo_orbitals = get_pseudo_orbitals(builder["scf"]["pw"]["pseudos"])
         wannier_builder = Wannier90BaseWorkChain.get_builder_from_protocol(
             code=codes["wannier90"],
             structure=structure,
@@ -430,38 +490,20 @@ class Wannier90WorkChain(
             disentanglement_type=disentanglement_type,
             frozen_type=frozen_type,
             pseudo_family=pseudo_family,
+            pseudo_orbitals=pseudo_orbitals,
         )
         # Remove workchain excluded inputs
         wannier_builder["wannier90"].pop("structure", None)
         wannier_builder.pop("clean_workdir", None)
         builder.wannier90 = wannier_builder._inputs(prune=True)
 
-        # Prepare SCF builder
-        scf_overrides = inputs.get("scf", {})
-        scf_overrides["pseudo_family"] = pseudo_family
-        scf_builder = PwBaseWorkChain.get_builder_from_protocol(
-            code=codes["pw"],
-            structure=structure,
-            protocol=protocol,
-            overrides=scf_overrides,
-            electronic_type=electronic_type,
-            spin_type=pw_spin_type,
-        )
-        # Remove workchain excluded inputs
-        scf_builder["pw"].pop("structure", None)
-        scf_builder.pop("clean_workdir", None)
-        builder.scf = scf_builder._inputs(prune=True)
-
         # Prepare NSCF builder
         nscf_overrides = inputs.get("nscf", {})
         nscf_overrides["pseudo_family"] = pseudo_family
 
-        num_bands = wannier_builder["wannier90"]["parameters"]["num_bands"]
-        exclude_bands = (
-            wannier_builder["wannier90"]["parameters"]
-            .get_dict()
-            .get("exclude_bands", [])
-        )
+        wannier_parameters = wannier_builder["wannier90"]["parameters"].get_dict()
+        num_bands = wannier_parameters["num_bands"]
+        exclude_bands = wannier_parameters.get("exclude_bands", [])
         nscf_overrides["pw"]["parameters"]["SYSTEM"]["nbnd"] = num_bands + len(
             exclude_bands
         )
@@ -507,7 +549,6 @@ class Wannier90WorkChain(
         # Prepare pw2wannier90 builder
         exclude_projectors = None
         if exclude_semicore:
-            pseudo_orbitals = get_pseudo_orbitals(builder["scf"]["pw"]["pseudos"])
             exclude_projectors = get_semicore_list(
                 structure, pseudo_orbitals, spin_orbit_coupling
             )
@@ -536,12 +577,11 @@ class Wannier90WorkChain(
         summary["WannierDisentanglementType"] = disentanglement_type.name
         summary["WannierFrozenType"] = frozen_type.name
 
-        params = builder["wannier90"]["wannier90"]["parameters"].get_dict()
-        summary["num_bands"] = params["num_bands"]
-        summary["num_wann"] = params["num_wann"]
-        if "exclude_bands" in params:
-            summary["exclude_bands"] = params["exclude_bands"]
-        summary["mp_grid"] = params["mp_grid"]
+        summary["num_bands"] = num_bands
+        summary["num_wann"] = wannier_parameters["num_wann"]
+        if "exclude_bands" in wannier_parameters:
+            summary["exclude_bands"] = exclude_bands
+        summary["mp_grid"] = wannier_parameters["mp_grid"]
 
         notes = summary.get("notes", [])
         summary["notes"] = notes
@@ -556,21 +596,21 @@ class Wannier90WorkChain(
         """Try to pretty print the summary when the `get_builder_from_protocol` returns."""
         notes = summary.pop("notes", [])
 
-        print("Summary of key input parameters:")
-        for key, val in summary.items():
-            print(f"  {key}: {val}")
-        print("")
+        lines = ["Summary of key input parameters:"]
+        lines.extend(f"  {key}: {val}" for key, val in summary.items())
+        lines.append("")
 
-        if len(notes) == 0:
-            return
+        if len(notes) != 0:
+            lines.append("Notes:")
+            lines.extend(f"  * {note}" for note in notes)
 
-        print("Notes:")
-        for note in notes:
-            print(f"  * {note}")
+        # Write the whole summary at once
+        print("\n".join(lines))
 
     def setup(self) -> None:
         """Define the current structure in the context to be the input structure."""
         self.ctx.current_structure = self.inputs.structure
+        self.ctx.clean_workdir = self.inputs.clean_workdir.value
 
         if not self.should_run_scf():
             if self.should_run_nscf():
@@ -584,24 +624,47 @@ class Wannier90WorkChain(
                     "parent_folder"
                 ]
 
+    def inspect_pending(self):  # pylint: disable=inconsistent-return-statements
+        """Inspect the sub process launched by the last `run_*` step, if it is not inspected yet."""
+        inspect = self.ctx.pop("inspect_pending", None)
+        if inspect is not None:
+            return getattr(self, inspect)()
+
+    def report_launched(self, running, mode: str = None) -> None:
+        """Report the launch of a sub process.
+
+        The message is only formatted if the report level is enabled for the process logger.
+        """
+        if not self.logger.isEnabledFor(LOG_LEVEL_REPORT):
+            return
+
+        message = f"launching {running.process_label}<{running.pk}>"
+        if mode is not None:
+            message += f" in {mode} mode"
+        self.report(message)
+
     def should_run_scf(self) -> bool:
         """If the 'scf' input namespace was specified, run the scf workchain."""
         return "scf" in self.inputs
 
     def run_scf(self):
         """Run the `PwBaseWorkChain` in scf mode on the current structure."""
-        inputs = AttributeDict(self.exposed_inputs(PwBaseWorkChain, namespace="scf"))
+        inputs = self.exposed_inputs(PwBaseWorkChain, namespace="scf")
         inputs.pw.structure = self.ctx.current_structure
         inputs.metadata.call_link_label = "scf"
 
         inputs = prepare_process_inputs(PwBaseWorkChain, inputs)
         running = self.submit(PwBaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}> in scf mode")
+        self.report_launched(running, mode="scf")
+
+        self.ctx.inspect_pending = "inspect_scf"
 
         return ToContext(workchain_scf=running)
 
     def inspect_scf(self):  # pylint: disable=inconsistent-return-statements
         """Verify that the `PwBaseWorkChain` for the scf run successfully finished."""
+        # The explicit `inspect_*` steps of derived outlines also clear the pending one
+        self.ctx.pop("inspect_pending", None)
         workchain = self.ctx.workchain_scf
 
         if not workchain.is_finished_ok:
@@ -618,19 +681,22 @@ class Wannier90WorkChain(
 
     def run_nscf(self):
         """Run the PwBaseWorkChain in nscf mode."""
-        inputs = AttributeDict(self.exposed_inputs(PwBaseWorkChain, namespace="nscf"))
+        inputs = self.exposed_inputs(PwBaseWorkChain, namespace="nscf")
         inputs.pw.structure = self.ctx.current_structure
         inputs.pw.parent_folder = self.ctx.current_folder
         inputs.metadata.call_link_label = "nscf"
 
         inputs = prepare_process_inputs(PwBaseWorkChain, inputs)
         running = self.submit(PwBaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}> in nscf mode")
+        self.report_launched(running, mode="nscf")
+
+        self.ctx.inspect_pending = "inspect_nscf"
 
         return ToContext(workchain_nscf=running)
 
     def inspect_nscf(self):  # pylint: disable=inconsistent-return-statements
         """Verify that the `PwBaseWorkChain` for the nscf run successfully finished."""
+        self.ctx.pop("inspect_pending", None)
         workchain = self.ctx.workchain_nscf
 
         if not workchain.is_finished_ok:
@@ -647,20 +713,21 @@ class Wannier90WorkChain(
 
     def run_projwfc(self):
         """Projwfc step."""
-        inputs = AttributeDict(
-            self.exposed_inputs(ProjwfcBaseWorkChain, namespace="projwfc")
-        )
+        inputs = self.exposed_inputs(ProjwfcBaseWorkChain, namespace="projwfc")
         inputs.projwfc.parent_folder = self.ctx.current_folder
         inputs.metadata.call_link_label = "projwfc"
 
         inputs = prepare_process_inputs(ProjwfcBaseWorkChain, inputs)
         running = self.submit(ProjwfcBaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}>")
+        self.report_launched(running)
+
+        self.ctx.inspect_pending = "inspect_projwfc"
 
         return ToContext(workchain_projwfc=running)
 
     def inspect_projwfc(self):  # pylint: disable=inconsistent-return-statements
         """Verify that the `ProjwfcCalculation` for the projwfc run successfully finished."""
+        self.ctx.pop("inspect_pending", None)
         workchain = self.ctx.workchain_projwfc
 
         if not workchain.is_finished_ok:
@@ -681,8 +748,8 @@ class Wannier90WorkChain(
             get_fermi_energy_from_nscf,
         )
 
-        base_inputs = AttributeDict(
-            self.exposed_inputs(Wannier90BaseWorkChain, namespace="wannier90")
+        base_inputs = self.exposed_inputs(
+            Wannier90BaseWorkChain, namespace="wannier90"
         )
         inputs = base_inputs["wannier90"]
         inputs.structure = self.ctx.current_structure
@@ -699,9 +766,10 @@ class Wannier90WorkChain(
                 fermi_energy = parameters["fermi_energy"]
             else:
                 raise ValueError("Cannot retrieve Fermi energy from scf or nscf output")
-        parameters["fermi_energy"] = fermi_energy
-
-        inputs.parameters = orm.Dict(parameters)
+        # Only create a new `Dict` node if the Fermi energy is changed
+        if parameters.get("fermi_energy", None) != fermi_energy:
+            parameters["fermi_energy"] = fermi_energy
+            inputs.parameters = orm.Dict(parameters)
 
         # Add `postproc_setup`
         if "settings" in inputs:
@@ -744,12 +812,15 @@ class Wannier90WorkChain(
 
         inputs = prepare_process_inputs(Wannier90BaseWorkChain, inputs)
         running = self.submit(Wannier90BaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}> in postproc mode")
+        self.report_launched(running, mode="postproc")
+
+        self.ctx.inspect_pending = "inspect_wannier90_pp"
 
         return ToContext(workchain_wannier90_pp=running)
 
     def inspect_wannier90_pp(self):  # pylint: disable=inconsistent-return-statements
         """Verify that the `Wannier90Calculation` for the wannier90 run successfully finished."""
+        self.ctx.pop("inspect_pending", None)
         workchain = self.ctx.workchain_wannier90_pp
 
         if not workchain.is_finished_ok:
@@ -766,11 +837,11 @@ class Wannier90WorkChain(
         scdm_mu/sigma from projectability, etc.
         Moreover, it can be overridden in derived classes.
         """
-        base_inputs = AttributeDict(
-            self.exposed_inputs(Pw2wannier90BaseWorkChain, namespace="pw2wannier90")
+        base_inputs = self.exposed_inputs(
+            Pw2wannier90BaseWorkChain, namespace="pw2wannier90"
         )
         inputs = base_inputs["pw2wannier90"]
-        parameters = inputs.parameters.get_dict().get("inputpp", {})
+        parameters = inputs.parameters.base.attributes.get("inputpp", {})
 
         scdm_proj = parameters.get("scdm_proj", False)
         scdm_entanglement = parameters.get("scdm_entanglement", None)
@@ -805,12 +876,15 @@ class Wannier90WorkChain(
 
         inputs = prepare_process_inputs(Pw2wannier90BaseWorkChain, inputs)
         running = self.submit(Pw2wannier90BaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}>")
+        self.report_launched(running)
+
+        self.ctx.inspect_pending = "inspect_pw2wannier90"
 
         return ToContext(workchain_pw2wannier90=running)
 
     def inspect_pw2wannier90(self):  # pylint: disable=inconsistent-return-statements
         """Verify that the Pw2wannier90BaseWorkChain for the pw2wannier90 run successfully finished."""
+        self.ctx.pop("inspect_pending", None)
         workchain = self.ctx.workchain_pw2wannier90
 
         if not workchain.is_finished_ok:
@@ -830,10 +904,13 @@ class Wannier90WorkChain(
         """
         from copy import deepcopy
 
-        from aiida_wannier90_workflows.utils.workflows import get_last_calcjob
+        from aiida_wannier90_workflows.utils.workflows import (
+            get_calcjob_inputs,
+            get_last_calcjob,
+        )
 
-        base_inputs = AttributeDict(
-            self.exposed_inputs(Wannier90BaseWorkChain, namespace="wannier90")
+        base_inputs = self.exposed_inputs(
+            Wannier90BaseWorkChain, namespace="wannier90"
         )
 
         # I need to disable Fermi energy shifting since this is done in postproc step,
@@ -852,10 +929,14 @@ class Wannier90WorkChain(
             stash = deepcopy(inputs["metadata"]["options"]["stash"])
 
         # Use the Wannier90BaseWorkChain-corrected parameters
-        last_calc = get_last_calcjob(self.ctx.workchain_wannier90_pp)
+        # Memoized since derived workchains call this method repeatedly, e.g. in optimization loops
+        if "last_wannier90_pp_calc" not in self.ctx:
+            self.ctx.last_wannier90_pp_calc = get_last_calcjob(
+                self.ctx.workchain_wannier90_pp
+            )
+        last_calc = self.ctx.last_wannier90_pp_calc
         # copy postproc inputs, especially the `kmesh_tol` might have been corrected
-        for key in last_calc.inputs:
-            inputs[key] = last_calc.inputs[key]
+        inputs.update(get_calcjob_inputs(last_calc))
 
         inputs["remote_input_folder"] = self.ctx.current_folder
 
@@ -885,12 +966,15 @@ class Wannier90WorkChain(
 
         inputs = prepare_process_inputs(Wannier90BaseWorkChain, inputs)
         running = self.submit(Wannier90BaseWorkChain, **inputs)
-        self.report(f"launching {running.process_label}<{running.pk}>")
+        self.report_launched(running)
+
+        self.ctx.inspect_pending = "inspect_wannier90"
 
         return ToContext(workchain_wannier90=running)
 
     def inspect_wannier90(self):  # pylint: disable=inconsistent-return-statements
         """Verify that the `Wannier90BaseWorkChain` for the wannier90 run successfully finished."""
+        self.ctx.pop("inspect_pending", None)
         workchain = self.ctx.workchain_wannier90
 
         if not workchain.is_finished_ok:
@@ -949,9 +1033,10 @@ class Wannier90WorkChain(
             )
         )
 
-        result = self.sanity_check()
-        if result:
-            return result
+        if self.inputs.perform_sanity_checks:
+            result = self.sanity_check()
+            if result:
+                return result
 
         self.report(f"{self.get_name()} successfully completed")
 
@@ -988,15 +1073,19 @@ class Wannier90WorkChain(
                 # The type of `self.inputs['scf']['pw']['pseudos']` is AttributesFrozendict,
                 # we need to convert it to dict, otherwise get_number_of_projections will fail.
                 "pseudos": dict(pseudos),
+                "composition": self.ctx.current_structure.get_composition(),
             }
             if "workchain_projwfc" in self.ctx:
                 num_proj = len(
                     self.ctx.workchain_projwfc.outputs["projections"].get_orbitals()
                 )
-                params = self.ctx.workchain_wannier90.inputs["wannier90"][
-                    "parameters"
-                ].get_dict()
-                spin_orbit_coupling = params.get("spinors", False)
+                # Only fetch the needed key instead of copying the whole parameters dict
+                wannier90_parameters = self.ctx.workchain_wannier90.inputs[
+                    "wannier90"
+                ]["parameters"]
+                spin_orbit_coupling = wannier90_parameters.base.attributes.get(
+                    "spinors", False
+                )
                 number_of_projections = get_number_of_projections(
                     **args, spin_orbit_coupling=spin_orbit_coupling
                 )
@@ -1010,16 +1099,13 @@ class Wannier90WorkChain(
         # only check num electrons when we already know pseudos in the check num projectors step
         check_num_elecs = check_num_projs
         if "workchain_scf" in self.ctx:
-            num_elec = self.ctx.workchain_scf.outputs["output_parameters"][
-                "number_of_electrons"
-            ]
+            output_parameters = self.ctx.workchain_scf.outputs.output_parameters
         elif "workchain_nscf" in self.ctx:
-            num_elec = self.ctx.workchain_nscf.outputs["output_parameters"][
-                "number_of_electrons"
-            ]
+            output_parameters = self.ctx.workchain_nscf.outputs.output_parameters
         else:
             check_num_elecs = False
         if check_num_elecs:
+            num_elec = output_parameters["number_of_electrons"]
             number_of_electrons = get_number_of_electrons(**args)
             if number_of_electrons != num_elec:
                 self.report(
@@ -1029,21 +1115,21 @@ class Wannier90WorkChain(
 
     def on_terminated(self):
         """Clean the working directories of all child calculations if `clean_workdir=True` in the inputs."""
+        from aiida_wannier90_workflows.utils.workflows import clean_remote_folders
+
         super().on_terminated()
 
-        if not self.inputs.clean_workdir:
+        # The process might be terminated before `setup`
+        if "clean_workdir" in self.ctx:
+            clean_workdir = self.ctx.clean_workdir
+        else:
+            clean_workdir = self.inputs.clean_workdir.value
+
+        if not clean_workdir:
             self.report("remote folders will not be cleaned")
             return
 
-        cleaned_calcs = []
-
-        for called_descendant in self.node.called_descendants:
-            if isinstance(called_descendant, orm.CalcJobNode):
-                try:
-                    called_descendant.outputs.remote_folder._clean()  # pylint: disable=protected-access
-                    cleaned_calcs.append(called_descendant.pk)
-                except (OSError, KeyError):
-                    pass
+        cleaned_calcs = clean_remote_folders(self.node)
 
         if cleaned_calcs:
             self.report(
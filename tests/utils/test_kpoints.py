@@ -41,3 +41,25 @@ def test_get_mesh_from_kpoints():
     mesh = get_mesh_from_kpoints(kpoints)
 
     assert np.allclose(mesh, [3, 4, 5])
+
+
+def test_get_explicit_kpoints():
+    """Test the function ``aiida_wannier90_workflows.utils.kpoints.get_explicit_kpoints``."""
+    from aiida_wannier90_workflows.utils.kpoints import get_explicit_kpoints
+
+    mesh = [2, 3, 4]
+    kmesh = orm.KpointsData()
+    kmesh.set_kpoints_mesh(mesh)
+
+    klist = get_explicit_kpoints(kmesh)
+    kpoints, weights = klist.get_kpoints(also_weights=True)
+
+    # Same order as the nested loops of `kmesh.pl`, the last direction runs fastest
+    reference = [
+        [x / mesh[0], y / mesh[1], z / mesh[2]]
+        for x in range(mesh[0])
+        for y in range(mesh[1])
+        for z in range(mesh[2])
+    ]
+    assert np.allclose(kpoints, reference)
+    assert np.allclose(weights, 1 / 24)
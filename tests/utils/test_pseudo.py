@@ -0,0 +1,88 @@
+"""Unit tests for the :py:mod:`~aiida_wannier90_workflows.utils.pseudo` module."""
+
+import io
+
+import pytest
+
+
+@pytest.fixture
+def count_upf_content(monkeypatch):
+    """Count the calls of ``get_upf_content`` while the UPF metadata cache is empty."""
+    from aiida_wannier90_workflows.utils.pseudo import upf as upf_module
+
+    calls = []
+    get_upf_content = upf_module.get_upf_content
+
+    def _get_upf_content(upf):
+        calls.append(upf)
+        return get_upf_content(upf)
+
+    monkeypatch.setattr(upf_module, "_UPF_METADATA_CACHE", {})
+    monkeypatch.setattr(upf_module, "get_upf_content", _get_upf_content)
+
+    return calls
+
+
+def test_get_upf_metadata_stored(generate_upf_data, count_upf_content):
+    """Test ``get_upf_metadata`` only parses a stored pseudo once."""
+    from aiida_wannier90_workflows.utils.pseudo.upf import get_upf_metadata
+
+    upf = generate_upf_data("Si")
+
+    assert get_upf_metadata(upf) == (4, 4.0, False)
+    assert get_upf_metadata(upf) == (4, 4.0, False)
+    assert len(count_upf_content) == 1
+
+
+def test_get_upf_metadata_unstored(count_upf_content):
+    """Test ``get_upf_metadata`` does not cache an unstored pseudo."""
+    from aiida_pseudo.data.pseudo import UpfData
+
+    from aiida_wannier90_workflows.utils.pseudo.upf import get_upf_metadata
+
+    content = (
+        '<UPF version="2.0.1">\n'
+        '<PP_HEADER\nelement="Si"\nz_valence="4.0"\nhas_so="F"\nnumber_of_wfc="2"\n/>\n'
+        '<PP_PSWFC>\n<PP_CHI.1 l="0"/>\n<PP_CHI.2 l="1"/>\n</PP_PSWFC>\n'
+        "</UPF>\n"
+    )
+    upf = UpfData(io.BytesIO(content.encode("utf-8")), filename="Si.upf")
+
+    assert get_upf_metadata(upf) == (4, 4.0, False)
+    assert get_upf_metadata(upf) == (4, 4.0, False)
+    assert len(count_upf_content) == 2
+
+
+@pytest.mark.parametrize(
+    "spin_orbit_coupling, expected",
+    (
+        (False, [1, 2, 3, 4, 5]),
+        (True, list(range(1, 11))),
+    ),
+)
+def test_get_semicore_list(generate_structure, spin_orbit_coupling, expected):
+    """Test ``get_semicore_list`` for the indices of the semicore pswfcs."""
+    from aiida_wannier90_workflows.utils.pseudo import get_semicore_list
+
+    structure = generate_structure("GaAs")
+    pseudo_orbitals = {
+        "Ga": {"pswfcs": ["3D", "4S", "4P"], "semicores": ["3D"]},
+        "As": {"pswfcs": ["4S", "4P"], "semicores": []},
+    }
+
+    semicore_list = get_semicore_list(structure, pseudo_orbitals, spin_orbit_coupling)
+    assert semicore_list == expected
+
+
+def test_get_semicore_list_missing(generate_structure):
+    """Test ``get_semicore_list`` raises if a semicore is not in the pswfcs."""
+    from aiida_wannier90_workflows.utils.pseudo import get_semicore_list
+
+    structure = generate_structure("GaAs")
+    pseudo_orbitals = {
+        "Ga": {"pswfcs": ["4S", "4P"], "semicores": ["3D"]},
+        "As": {"pswfcs": ["4S", "4P"], "semicores": []},
+    }
+
+    with pytest.raises(ValueError, match="are not in the pswfcs"):
+        get_semicore_list(structure, pseudo_orbitals, False)
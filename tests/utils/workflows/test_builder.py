@@ -101,3 +101,70 @@ def test_serializer(inout):
     from aiida_wannier90_workflows.utils.workflows.builder.serializer import serialize
 
     assert serialize(inout[0]) == inout[1], inout
+
+
+@pytest.mark.parametrize(
+    "electronic_type, projection_type, expected",
+    (
+        ("INSULATOR", "ANALYTIC", ("NONE", "NONE")),
+        ("METAL", "SCDM", ("NONE", "NONE")),
+        ("METAL", "ANALYTIC", ("SMV", "ENERGY_FIXED")),
+        ("METAL", "ATOMIC_PROJECTORS_QE", ("SMV", "FIXED_PLUS_PROJECTABILITY")),
+    ),
+)
+def test_guess_wannier_projection_types(electronic_type, projection_type, expected):
+    """Test the default types of ``guess_wannier_projection_types``."""
+    from aiida_quantumespresso.common.types import ElectronicType
+
+    from aiida_wannier90_workflows.common.types import (
+        WannierDisentanglementType,
+        WannierFrozenType,
+        WannierProjectionType,
+    )
+    from aiida_wannier90_workflows.utils.workflows.builder.projections import (
+        guess_wannier_projection_types,
+    )
+
+    projection_type = WannierProjectionType[projection_type]
+    types = guess_wannier_projection_types(
+        ElectronicType[electronic_type], projection_type
+    )
+
+    assert types == (
+        projection_type,
+        WannierDisentanglementType[expected[0]],
+        WannierFrozenType[expected[1]],
+    )
+
+
+@pytest.mark.parametrize(
+    "electronic_type, projection_type, disentanglement_type, frozen_type",
+    (
+        ("INSULATOR", "ANALYTIC", "SMV", None),
+        ("METAL", "SCDM", None, "ENERGY_FIXED"),
+        ("METAL", "ANALYTIC", "NONE", None),
+        ("METAL", None, None, None),
+    ),
+)
+def test_guess_wannier_projection_types_raises(
+    electronic_type, projection_type, disentanglement_type, frozen_type
+):
+    """Test ``guess_wannier_projection_types`` rejects incompatible types."""
+    from aiida_quantumespresso.common.types import ElectronicType
+
+    from aiida_wannier90_workflows.common.types import (
+        WannierDisentanglementType,
+        WannierFrozenType,
+        WannierProjectionType,
+    )
+    from aiida_wannier90_workflows.utils.workflows.builder.projections import (
+        guess_wannier_projection_types,
+    )
+
+    with pytest.raises(ValueError):
+        guess_wannier_projection_types(
+            ElectronicType[electronic_type],
+            projection_type and WannierProjectionType[projection_type],
+            disentanglement_type and WannierDisentanglementType[disentanglement_type],
+            frozen_type and WannierFrozenType[frozen_type],
+        )
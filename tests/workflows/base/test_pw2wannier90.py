@@ -136,3 +136,271 @@ def test_handle_output_stdout_incomplete(
         npool_key,
         f"{new_npool_value}",
     ]
+
+
+@pytest.mark.parametrize(
+    "stdout, expected",
+    (
+        ("JobID|MaxRSS|\n123|||\n123.batch|2048K|\n123.0|1536K|\n", 2048),
+        ("JobID|MaxRSS|\n123.0|3M|\n", 3 * 1024),
+        ("JobID|MaxRSS|\n123.0|1.5G|\n", 1.5 * 1024**2),
+        ("JobID|MaxRSS|\n123.0|4096|\n", 4),
+        ("JobID|State|\n123.0|FAILED|\n", None),
+        ("JobID|MaxRSS|\n123.0||\n", None),
+        ("", None),
+        ("  \n\n", None),
+    ),
+)
+def test_get_max_rss_kb(stdout, expected):
+    """Test `_get_max_rss_kb` parsing the `sacct` output of the detailed job info."""
+    from types import SimpleNamespace
+
+    from aiida_wannier90_workflows.workflows.base.qebaserestart import _get_max_rss_kb
+
+    calculation = SimpleNamespace(get_detailed_job_info=lambda: {"stdout": stdout})
+
+    assert _get_max_rss_kb(calculation) == expected
+
+
+@pytest.fixture
+def generate_workchain_out_of_memory(
+    generate_workchain_pw2wannier90_base, generate_inputs_pw2wannier90_base
+):
+    """Generate a `Pw2wannier90BaseWorkChain` whose calculation ran out of memory."""
+    from aiida import orm
+
+    def _generate_workchain_out_of_memory(resources, options=None, cmdline=None):
+        inputs = {"pw2wannier90": generate_inputs_pw2wannier90_base()}
+        inputs["pw2wannier90"]["metadata"]["options"] = {
+            "resources": resources,
+            "max_wallclock_seconds": 3600,
+            "withmpi": True,
+            "scheduler_stderr": "_scheduler-stderr.txt",
+            **(options or {}),
+        }
+        if cmdline is not None:
+            inputs["pw2wannier90"]["settings"] = orm.Dict({"cmdline": cmdline})
+        process = generate_workchain_pw2wannier90_base(
+            exit_code=Pw2wannier90Calculation.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE,
+            inputs=inputs,
+            test_name="out_of_memory",
+        )
+        process.setup()
+        return process
+
+    return _generate_workchain_out_of_memory
+
+
+@pytest.mark.parametrize(
+    "max_rss, max_memory_kb, expected",
+    (
+        (None, 8 * 1024**2, 4),
+        ("2G", None, 4),
+        ("2G", 8 * 1024**2, 3),
+        ("512M", 8 * 1024**2, 4),
+        ("8G", 8 * 1024**2, 1),
+    ),
+)
+def test_get_oom_num_mpiprocs_per_machine(
+    generate_workchain_out_of_memory, max_rss, max_memory_kb, expected
+):
+    """Test `get_oom_num_mpiprocs_per_machine` with the peak memory per process."""
+    options = {} if max_memory_kb is None else {"max_memory_kb": max_memory_kb}
+    process = generate_workchain_out_of_memory(
+        {"num_machines": 1, "num_mpiprocs_per_machine": 8}, options
+    )
+    calculation = process.ctx.children[-1]
+    if max_rss is not None:
+        calculation.set_detailed_job_info(
+            {"stdout": f"JobID|MaxRSS|\n123|||\n123.0|{max_rss}|\n"}
+        )
+
+    assert process.get_oom_num_mpiprocs_per_machine(calculation, 8) == expected
+    assert len(process.ctx.oom_history) == 1
+    assert process.ctx.oom_history[0][0] == 8
+
+
+def test_handle_output_stdout_incomplete_memory(generate_workchain_out_of_memory):
+    """Test the cmdline is scaled when the MPI processes are reduced from the memory."""
+    process = generate_workchain_out_of_memory(
+        {"num_machines": 1, "num_mpiprocs_per_machine": 8},
+        {"max_memory_kb": 8 * 1024**2},
+        cmdline=["-nk", "4"],
+    )
+    calculation = process.ctx.children[-1]
+    calculation.set_detailed_job_info({"stdout": "JobID|MaxRSS|\n123.0|2G|\n"})
+    resources = process.ctx.inputs["metadata"]["options"]["resources"]
+
+    result = process.handle_output_stdout_incomplete(calculation)
+    assert isinstance(result, ProcessHandlerReport)
+    assert result.exit_code.status == 0
+
+    # The resources of the ctx inputs are modified in place
+    assert process.ctx.inputs["metadata"]["options"]["resources"] is resources
+    assert resources["num_mpiprocs_per_machine"] == 3
+    # The number of pools is reduced by the same ratio, i.e. 4 * 3 // 8
+    assert process.ctx.inputs["settings"]["cmdline"] == ["-nk", "1"]
+
+
+def test_handle_output_stdout_incomplete_unchanged(generate_workchain_out_of_memory):
+    """Test the handler aborts if the number of MPI processes cannot be reduced."""
+    process = generate_workchain_out_of_memory(
+        {"num_machines": 1, "num_mpiprocs_per_machine": 4}, cmdline=["-nk", "2"]
+    )
+    process._mpi_proc_reduce_shift = 0  # pylint: disable=protected-access
+    settings = process.ctx.inputs["settings"]
+
+    result = process.handle_output_stdout_incomplete(process.ctx.children[-1])
+    assert result.do_break
+    assert (
+        result.exit_code
+        == Pw2wannier90BaseWorkChain.exit_codes.ERROR_OUTPUT_STDOUT_INCOMPLETE
+    )
+
+    resources = process.ctx.inputs["metadata"]["options"]["resources"]
+    assert resources["num_mpiprocs_per_machine"] == 4
+    assert process.ctx.inputs["settings"] is settings
+
+
+def test_is_out_of_memory_cached(monkeypatch, generate_workchain_out_of_memory):
+    """Test the scheduler stderr of a calculation is only read once."""
+    process = generate_workchain_out_of_memory({"num_machines": 1})
+    calculation = process.ctx.children[-1]
+    calls = []
+
+    def get_scheduler_stderr_tail(calc):
+        calls.append(calc)
+        return "srun: error: nid001: task 0: Out Of Memory"
+
+    monkeypatch.setattr(process, "get_scheduler_stderr_tail", get_scheduler_stderr_tail)
+
+    assert process.is_out_of_memory(calculation)
+    assert process.is_out_of_memory(calculation)
+    assert len(calls) == 1
+
+
+def test_has_packing_scheduler(generate_workchain_out_of_memory):
+    """Test `has_packing_scheduler` from the scheduler type of the computer."""
+    from types import SimpleNamespace
+
+    process = generate_workchain_out_of_memory(
+        {"num_machines": 1, "num_mpiprocs_per_machine": 4}
+    )
+    assert not process.has_packing_scheduler()
+
+    scheduler = SimpleNamespace(scheduler_type="hyperqueue")
+    process.ctx.inputs.code = SimpleNamespace(computer=scheduler)
+    assert process.has_packing_scheduler()
+
+
+@pytest.mark.parametrize(
+    "resources, resource_key",
+    (
+        ({"num_mpiprocs": 8}, "num_mpiprocs"),
+        ({"num_cpus": 8}, "num_cpus"),
+        (
+            {"num_machines": 1, "num_mpiprocs_per_machine": 8},
+            "num_mpiprocs_per_machine",
+        ),
+    ),
+)
+def test_handle_output_stdout_incomplete_packed(
+    generate_workchain_out_of_memory, resources, resource_key
+):
+    """Test the resources of the packing schedulers are reduced for OOM restarts."""
+    process = generate_workchain_out_of_memory(
+        {"num_machines": 1, "num_mpiprocs_per_machine": 8}, cmdline=["-nk", "4"]
+    )
+    # The resources are only validated by the scheduler plugin of the meta-scheduler
+    process.ctx.inputs.metadata.options.resources = dict(resources)
+    process.ctx.pack_restarts = True
+
+    result = process.handle_output_stdout_incomplete(process.ctx.children[-1])
+    assert result.exit_code.status == 0
+
+    new_resources = process.ctx.inputs["metadata"]["options"]["resources"]
+    assert new_resources == {**resources, resource_key: 4}
+    assert process.ctx.inputs["settings"]["cmdline"] == ["-nk", "2"]
+
+
+OOM_STDERR = (
+    ("slurmstepd: error: Detected 1 oom-kill event(s) in step 123.0 cgroup.", True),
+    ("srun: error: nid001: task 0: Out Of Memory", True),
+    ("slurmstepd: error: oom-kill disabled for this job", False),
+    ("", False),
+)
+
+
+@pytest.mark.parametrize("scheduler_stderr, expected", OOM_STDERR)
+def test_scan_out_of_memory(monkeypatch, scheduler_stderr, expected):
+    """Test `_scan_out_of_memory` with the `re` fallback."""
+    from aiida_wannier90_workflows.workflows.base import qebaserestart
+
+    monkeypatch.setattr(qebaserestart, "_get_oom_database", lambda: None)
+
+    assert qebaserestart._scan_out_of_memory(scheduler_stderr) is expected
+
+
+@pytest.mark.parametrize("scheduler_stderr, expected", OOM_STDERR)
+def test_scan_out_of_memory_hyperscan(scheduler_stderr, expected):
+    """Test `_scan_out_of_memory` with the `hyperscan` of the `speedups` extra."""
+    pytest.importorskip("hyperscan")
+
+    from aiida_wannier90_workflows.workflows.base import qebaserestart
+
+    assert qebaserestart._get_oom_database() is not None
+    assert qebaserestart._scan_out_of_memory(scheduler_stderr) is expected
+
+
+@pytest.fixture
+def fake_hyperscan(monkeypatch):
+    """Install a `hyperscan` module which matches the compiled patterns with `re`."""
+    import re
+    import sys
+    import types
+
+    from aiida_wannier90_workflows.workflows.base import qebaserestart
+
+    class Database:
+        """Mimic `hyperscan.Database`, only the methods used in `qebaserestart`."""
+
+        def __init__(self):
+            self.patterns = []
+
+        def compile(self, expressions, ids, elements, flags):
+            assert len(expressions) == len(ids) == elements
+            assert flags == module.HS_FLAG_SINGLEMATCH
+            self.patterns = [(id_, re.compile(_)) for id_, _ in zip(ids, expressions)]
+
+        def scan(self, data, match_event_handler):
+            assert isinstance(data, bytes)
+            for id_, pattern in self.patterns:
+                match = pattern.search(data)
+                if match is not None:
+                    match_event_handler(id_, match.start(), match.end(), 0, None)
+
+    module = types.ModuleType("hyperscan")
+    module.Database = Database
+    module.HS_FLAG_SINGLEMATCH = 8
+
+    monkeypatch.setitem(sys.modules, "hyperscan", module)
+    qebaserestart._get_oom_database.cache_clear()
+    yield module
+    qebaserestart._get_oom_database.cache_clear()
+
+
+@pytest.mark.parametrize("scheduler_stderr, expected", OOM_STDERR)
+def test_scan_out_of_memory_backends(
+    monkeypatch, fake_hyperscan, scheduler_stderr, expected
+):
+    """Test the `hyperscan` database and the `re` fallback give the same result."""
+    from aiida_wannier90_workflows.workflows.base import qebaserestart
+
+    database = qebaserestart._get_oom_database()
+    assert isinstance(database, fake_hyperscan.Database)
+    result_hyperscan = qebaserestart._scan_out_of_memory(scheduler_stderr)
+
+    monkeypatch.setattr(qebaserestart, "_get_oom_database", lambda: None)
+    result_re = qebaserestart._scan_out_of_memory(scheduler_stderr)
+
+    assert result_hyperscan is result_re is expected
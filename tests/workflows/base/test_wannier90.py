@@ -125,6 +125,27 @@ def test_prepare_inputs_auto_energy_windows(
     assert abs(parameters["dis_froz_max"] - 3.98697455) < 1e-8, parameters
 
 
+def test_prepare_inputs_unchanged_parameters(
+    generate_inputs_wannier90_base,
+    generate_workchain_wannier90_base,
+    generate_bands_data,
+):
+    """Test `Wannier90BaseWorkChain.prepare_inputs` keeps the parameters node if unchanged."""
+    from aiida.orm import Dict
+
+    inputs = generate_inputs_wannier90_base()
+    # Below the energy to freeze all the `num_wann` bands, so it is not modified
+    inputs["parameters"] = Dict({"fermi_energy": 1.2, "dis_froz_max": 1, "num_wann": 4})
+
+    inputs = {"wannier90": inputs}
+    inputs["bands"] = generate_bands_data()
+
+    process = generate_workchain_wannier90_base(inputs=inputs)
+    inputs = process.prepare_inputs()
+
+    assert inputs["parameters"].uuid == process.inputs.wannier90.parameters.uuid
+
+
 @pytest.mark.parametrize(
     "num_procs",
     (
@@ -284,6 +305,31 @@ def test_handle_disentanglement_not_enough_states(
     )
 
 
+def test_handle_disentanglement_not_enough_states_default(
+    generate_workchain_wannier90_base, generate_inputs_wannier90_base
+):
+    """Test `handle_disentanglement_not_enough_states` starts from the default `dis_proj_min`."""
+    from aiida import orm
+
+    inputs = {"wannier90": generate_inputs_wannier90_base()}
+    inputs["wannier90"]["parameters"] = orm.Dict({"dis_proj_max": 0.9})
+    process = generate_workchain_wannier90_base(
+        exit_code=Wannier90Calculation.exit_codes.ERROR_DISENTANGLEMENT_NOT_ENOUGH_STATES,
+        test_name="not_enough_states",
+        inputs=inputs,
+    )
+    process.setup()
+
+    result = process.handle_disentanglement_not_enough_states(process.ctx.children[-1])
+    assert isinstance(result, ProcessHandlerReport)
+    assert result.exit_code.status == 0
+
+    parameters = process.ctx.inputs["parameters"].get_dict()
+    default_disprojmin = Wannier90BaseWorkChain._WANNIER90_DEFAULT_DIS_PROJ_MIN
+    assert abs(parameters["dis_proj_min"] - default_disprojmin * 0.5) < 1e-12
+    assert parameters["dis_proj_max"] == 0.9
+
+
 def test_handle_plot_wf_cube(
     generate_workchain_wannier90_base, generate_inputs_wannier90_base
 ):
@@ -339,9 +339,10 @@ def generate_inputs_wannier90(generate_inputs_pw, fixture_code):
 def generate_workchain_wannier90(generate_workchain, generate_inputs_wannier90):
     """Generate an instance of a `Wannier90WorkChain`."""
 
-    def _generate_workchain_wannier90():
+    def _generate_workchain_wannier90(inputs=None):
         entry_point = "wannier90_workflows.wannier90"
-        inputs = generate_inputs_wannier90()
+        if not inputs:
+            inputs = generate_inputs_wannier90()
         return generate_workchain(entry_point, inputs)
 
     return _generate_workchain_wannier90
@@ -210,3 +210,22 @@ def test_metadata_overrides(
     )
 
     data_regression.check(serialize_builder(builder))
+
+
+@pytest.mark.parametrize(
+    "structure_id, exclude_bands", (("Si", None), ("GaAs", [1, 2, 3, 4, 5]))
+)
+def test_exclude_semicore(
+    fixture_code, generate_structure, structure_id, exclude_bands
+):
+    """Test ``get_builder_from_protocol`` excludes the semicore bands."""
+    code = fixture_code("wannier90.wannier90")
+    structure = generate_structure(structure_id)
+
+    builder = Wannier90BaseWorkChain.get_builder_from_protocol(
+        code, structure=structure
+    )
+    parameters = builder["wannier90"]["parameters"].get_dict()
+
+    # Only set if there are semicores, as a list which can be stored in the `Dict`
+    assert parameters.get("exclude_bands", None) == exclude_bands
@@ -2,7 +2,9 @@
 
 import io
 
+import plumpy
 from plumpy.process_states import ProcessState
+import pytest
 
 from aiida import orm
 from aiida.common import LinkType
@@ -10,17 +12,31 @@ from aiida.common import LinkType
 from aiida_quantumespresso.calculations.helpers import pw_input_helper
 
 
+@pytest.mark.parametrize("perform_sanity_checks", (True, False))
 def test_scdm(
     generate_workchain_wannier90,
+    generate_inputs_wannier90,
     fixture_localhost,
     generate_remote_data,
     generate_bands_data,
     generate_projection_data,
     generate_calc_job_node,
-):  # pylint: disable=redefined-outer-name,too-many-statements
+    monkeypatch,
+    perform_sanity_checks,
+):  # pylint: disable=redefined-outer-name,too-many-statements,too-many-arguments
     """Test instantiating the WorkChain, then mock its process, by calling methods in the ``spec.outline``."""
-
-    workchain = generate_workchain_wannier90()
+    from aiida_wannier90_workflows.workflows.wannier90 import Wannier90WorkChain
+
+    inputs = generate_inputs_wannier90()
+    inputs["perform_sanity_checks"] = orm.Bool(perform_sanity_checks)
+    if not perform_sanity_checks:
+        monkeypatch.setattr(
+            Wannier90WorkChain,
+            "sanity_check",
+            lambda self: pytest.fail("sanity_check should be skipped"),
+        )
+
+    workchain = generate_workchain_wannier90(inputs)
     assert workchain.setup() is None
 
     # run scf
@@ -191,3 +207,182 @@ def test_scdm(
         _ in workchain.outputs
         for _ in ("scf", "nscf", "projwfc", "wannier90_pp", "pw2wannier90", "wannier90")
     )
+
+
+def test_on_terminated_before_setup(
+    generate_workchain, generate_inputs_wannier90, monkeypatch
+):
+    """Test `on_terminated` reads the `clean_workdir` input if `setup` never ran."""
+    from aiida_wannier90_workflows.utils import workflows
+
+    cleaned_nodes = []
+    monkeypatch.setattr(
+        workflows,
+        "clean_remote_folders",
+        lambda node: cleaned_nodes.append(node) or [],
+    )
+
+    inputs = generate_inputs_wannier90()
+    inputs["clean_workdir"] = orm.Bool(True)
+    workchain = generate_workchain("wannier90_workflows.wannier90", inputs)
+
+    assert "clean_workdir" not in workchain.ctx
+    workchain.on_terminated()
+    assert cleaned_nodes == [workchain.node]
+
+
+def test_inspect_pending(
+    generate_workchain_wannier90, fixture_localhost, generate_remote_data
+):
+    """Test the inspection of a sub process merged into the next step of the outline."""
+    from aiida_wannier90_workflows.workflows.wannier90 import (
+        Wannier90WorkChain,
+        inspect_pending_then,
+    )
+
+    workchain = generate_workchain_wannier90()
+    assert workchain.setup() is None
+
+    scf_workchain = workchain.run_scf()["workchain_scf"]
+    assert workchain.ctx.inspect_pending == "inspect_scf"
+
+    remote = generate_remote_data(
+        computer=fixture_localhost, remote_path="/path/on/remote"
+    )
+    remote.store()
+    remote.base.links.add_incoming(
+        scf_workchain, link_type=LinkType.RETURN, link_label="remote_folder"
+    )
+    scf_workchain.set_process_state(ProcessState.FINISHED)
+    scf_workchain.set_exit_status(0)
+    workchain.ctx.workchain_scf = scf_workchain
+
+    # Save a checkpoint between the two steps and continue from the reloaded process
+    workchain = plumpy.Bundle(workchain).unbundle()
+    assert workchain.ctx.inspect_pending == "inspect_scf"
+
+    run_nscf = inspect_pending_then(Wannier90WorkChain.run_nscf)
+    nscf_workchain = run_nscf(workchain)["workchain_nscf"]
+    assert workchain.ctx.current_folder == remote
+    assert workchain.ctx.inspect_pending == "inspect_nscf"
+
+    # An explicit inspect step, as in the outline of derived classes, clears it
+    nscf_workchain.set_process_state(ProcessState.FINISHED)
+    nscf_workchain.set_exit_status(1)
+    workchain.ctx.workchain_nscf = nscf_workchain
+    assert (
+        workchain.inspect_nscf()
+        == Wannier90WorkChain.exit_codes.ERROR_SUB_PROCESS_FAILED_NSCF
+    )
+    assert "inspect_pending" not in workchain.ctx
+    assert workchain.inspect_pending() is None
+
+
+def test_inspect_pending_failed(generate_workchain_wannier90):
+    """Test the next outline step is not run if the pending sub process failed."""
+    from aiida_wannier90_workflows.workflows.wannier90 import (
+        Wannier90WorkChain,
+        inspect_pending_then,
+    )
+
+    workchain = generate_workchain_wannier90()
+    assert workchain.setup() is None
+
+    scf_workchain = workchain.run_scf()["workchain_scf"]
+    scf_workchain.set_process_state(ProcessState.FINISHED)
+    scf_workchain.set_exit_status(1)
+    workchain.ctx.workchain_scf = scf_workchain
+
+    run_nscf = inspect_pending_then(Wannier90WorkChain.run_nscf)
+    assert (
+        run_nscf(workchain)
+        == Wannier90WorkChain.exit_codes.ERROR_SUB_PROCESS_FAILED_SCF
+    )
+    assert "workchain_nscf" not in workchain.ctx
+
+
+def test_clean_remote_folders(fixture_localhost, generate_remote_data, monkeypatch):
+    """Test `clean_remote_folders` opens one transport per computer."""
+    from types import SimpleNamespace
+
+    from aiida_wannier90_workflows.utils.workflows import clean_remote_folders
+
+    workchain = orm.WorkChainNode()
+    workchain.store()
+    calcjobs = []
+    for idx in range(3):
+        calcjob = orm.CalcJobNode(computer=fixture_localhost)
+        calcjob.set_option(
+            "resources", {"num_machines": 1, "num_mpiprocs_per_machine": 1}
+        )
+        calcjob.base.links.add_incoming(
+            workchain, link_type=LinkType.CALL_CALC, link_label=f"iteration_{idx:02d}"
+        )
+        calcjob.store()
+        remote = generate_remote_data(fixture_localhost, f"/path/on/remote/{idx}")
+        remote.base.links.add_incoming(
+            calcjob, link_type=LinkType.CREATE, link_label="remote_folder"
+        )
+        remote.store()
+        calcjobs.append(calcjob)
+
+    transports = []
+
+    class Transport:
+        """Transport which only records that it is opened."""
+
+        def __enter__(self):
+            transports.append(self)
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+    def clean(remote_folder, transport=None):
+        assert transport is transports[-1]
+        if remote_folder.get_remote_path().endswith("1"):
+            raise OSError("Permission denied")
+
+    monkeypatch.setattr(
+        orm.RemoteData,
+        "get_authinfo",
+        lambda self: SimpleNamespace(get_transport=Transport),
+    )
+    monkeypatch.setattr(orm.RemoteData, "_clean", clean)
+
+    cleaned_calcs = clean_remote_folders(workchain)
+    assert len(transports) == 1
+    assert cleaned_calcs == sorted([calcjobs[0].pk, calcjobs[2].pk])
+
+    def get_transport():
+        raise OSError("Connection refused")
+
+    monkeypatch.setattr(
+        orm.RemoteData,
+        "get_authinfo",
+        lambda self: SimpleNamespace(get_transport=get_transport),
+    )
+    assert clean_remote_folders(workchain) == []
+
+
+def test_lazy_import():
+    """Test importing the `workflows` package does not import the workchain modules."""
+    import subprocess
+    import sys
+
+    # Run in a new interpreter, the modules are already imported in the test session
+    code = (
+        "import sys\n"
+        "from aiida_wannier90_workflows import workflows\n"
+        "prefixes = ('aiida.', 'aiida_quantumespresso', workflows.__name__ + '.')\n"
+        "print(sorted(_ for _ in sys.modules if _.startswith(prefixes)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    )
+    assert result.stdout.strip() == "[]", result.stdout
+
+    from aiida_wannier90_workflows.workflows import Wannier90WorkChain
+    from aiida_wannier90_workflows.workflows import wannier90
+
+    assert Wannier90WorkChain is wannier90.Wannier90WorkChain